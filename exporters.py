@@ -0,0 +1,124 @@
+import os
+import csv
+import json
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from helpers import compute_derived_columns, to_number, iter_chunks
+
+# ==========================================
+# EKSPOR DATA (CSV / JSONL / PARQUET)
+# ==========================================
+
+# (nama kolom, tipe) -> tipe dipakai untuk schema Parquet
+EXPORT_COLUMNS = [
+    ("File Name", "str"),
+    ("Status", "str"),
+    ("Message", "str"),
+    ("Project No", "str"),
+    ("Cust Name", "str"),
+    ("Proj Date", "str"),
+    ("Currency", "str"),
+    ("Kurs", "float"),
+    ("Project Value", "float"),
+    ("Proj IDR", "float"),
+    ("Sub Total", "float"),
+    ("Penalty", "float"),
+    ("Warranty", "float"),
+    ("Freight", "float"),
+    ("Cost", "float"),
+    ("Total Cost", "float"),
+    ("CM Booked", "float"),
+    ("CR Booked", "float"),
+    ("CM IDR", "float"),
+    ("CM %", "float"),
+    ("Cost %", "float"),
+]
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+
+def available_formats():
+    """Format yang bisa dipakai di environment ini (Parquet butuh pyarrow)."""
+    return tuple(f for f in EXPORT_FORMATS if f != "parquet" or pa is not None)
+
+def _iso_date(item):
+    dt = item.get("_sort_date", datetime.min)
+    if isinstance(dt, datetime) and dt != datetime.min:
+        return dt.strftime("%Y-%m-%d")
+    return str(item.get("Proj Date", "") or "")
+
+def iter_export_rows(records, batch_size=5000):
+    """Generator baris ekspor (dict), kolom turunan dihitung per batch."""
+    for batch in iter_chunks(records, batch_size):
+        derived = compute_derived_columns(batch)
+        for i, item in enumerate(batch):
+            yield {
+                "File Name": item.get("filename", ""),
+                "Status": item.get("status", ""),
+                "Message": item.get("msg", ""),
+                "Project No": str(item.get("Project No", "") or ""),
+                "Cust Name": str(item.get("Cust Name", "") or ""),
+                "Proj Date": _iso_date(item),
+                "Currency": item.get("Currency", ""),
+                "Kurs": derived["Kurs"][i],
+                "Project Value": to_number(item.get("Project Value", 0)),
+                "Proj IDR": derived["Proj IDR"][i],
+                "Sub Total": to_number(item.get("Sub Total", 0)),
+                "Penalty": to_number(item.get("Penalty", 0)),
+                "Warranty": to_number(item.get("Warranty", 0)),
+                "Freight": derived["Freight"][i],
+                "Cost": derived["Cost"][i],
+                "Total Cost": to_number(item.get("Total Cost", 0)),
+                "CM Booked": to_number(item.get("CM Booked", 0)),
+                "CR Booked": to_number(item.get("CR Booked", 0)),
+                "CM IDR": derived["CM IDR"][i],
+                "CM %": derived["CM %"][i],
+                "Cost %": derived["Cost %"][i],
+            }
+
+def write_csv(records, path):
+    names = [c for c, _ in EXPORT_COLUMNS]
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=names)
+        writer.writeheader()
+        for row in iter_export_rows(records):
+            writer.writerow(row)
+    return path
+
+def write_jsonl(records, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in iter_export_rows(records):
+            f.write(json.dumps(row, ensure_ascii=False))
+            f.write("\n")
+    return path
+
+def write_parquet(records, path, batch_size=5000):
+    if pa is None:
+        raise RuntimeError("Ekspor Parquet membutuhkan pyarrow (pip install pyarrow)")
+    schema = pa.schema([(c, pa.string() if t == "str" else pa.float64()) for c, t in EXPORT_COLUMNS])
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in iter_export_rows(records, batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    return path
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl, "parquet": write_parquet}
+
+def export_records(records, output_folder, base_name, formats):
+    """Tulis record ke setiap format yang diminta. Return list path hasil."""
+    paths = []
+    for fmt in formats:
+        path = os.path.join(output_folder, f"{base_name}.{fmt}")
+        paths.append(WRITERS[fmt](records, path))
+    return paths
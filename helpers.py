@@ -1,4 +1,6 @@
+import os
 import re
+from itertools import islice
 from datetime import datetime
 
 def sanitize_filename(name):
@@ -50,4 +52,58 @@ def addr_to_index(addr):
         col = col * 26 + (ord(char) - ord('A') + 1)
     col -= 1 # Excel col A -> index 0
     
-    return row, col
\ No newline at end of file
+    return row, col
+
+def get_cache_dir():
+    """Folder cache aplikasi (per user), dibuat otomatis jika belum ada."""
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "PCMGenerator")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def to_number(value):
+    """Nilai numerik aman untuk perhitungan (None/teks -> 0)."""
+    if isinstance(value, bool): return 0
+    if isinstance(value, (int, float)): return value
+    return clean_currency(value) if isinstance(value, str) else 0
+
+def effective_kurs(ccy, kurs):
+    """Kurs yang dipakai di summary: IDR selalu 1.0, kurs kosong -> 1.0"""
+    if ccy == "IDR": return 1.0
+    return kurs if kurs else 1.0
+
+def compute_derived_columns(records):
+    """
+    Menghitung kolom turunan summary (setara rumus Excel di GeneratorWorker)
+    sekaligus untuk seluruh record, per kolom:
+      Proj IDR = Project Value * Kurs
+      Cost     = Sub Total + Penalty + Warranty + Freight
+      CM IDR   = Proj IDR - Cost
+      CM %     = CM IDR / Proj IDR   (0 jika Proj IDR = 0)
+      Cost %   = Cost / Proj IDR     (0 jika Proj IDR = 0)
+    """
+    kurs = [effective_kurs(r.get("Currency", "IDR"), to_number(r.get("Kurs", 1.0))) for r in records]
+    proj_idr = [to_number(r.get("Project Value", 0)) * k for r, k in zip(records, kurs)]
+    freight = [0] * len(records)
+    cost = [to_number(r.get("Sub Total", 0)) + to_number(r.get("Penalty", 0)) + to_number(r.get("Warranty", 0)) + f
+            for r, f in zip(records, freight)]
+    cm_idr = [p - c for p, c in zip(proj_idr, cost)]
+    cm_pct = [m / p if p else 0 for m, p in zip(cm_idr, proj_idr)]
+    cost_pct = [c / p if p else 0 for c, p in zip(cost, proj_idr)]
+    return {
+        "Kurs": kurs,
+        "Proj IDR": proj_idr,
+        "Freight": freight,
+        "Cost": cost,
+        "CM IDR": cm_idr,
+        "CM %": cm_pct,
+        "Cost %": cost_pct,
+    }
+
+def iter_chunks(records, size):
+    """Bagi list / iterable record (mis. RecordSource) menjadi list berukuran size."""
+    it = iter(records)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk: return
+        yield chunk
@@ -1,10 +1,33 @@
 import sys
-from PySide6.QtWidgets import QApplication
-from ui import MainWindow
+import argparse
+import multiprocessing
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="PCM Summary Generator")
+    ap.add_argument("--serve", action="store_true", help="Jalankan mode server HTTP lokal (tanpa GUI)")
+    ap.add_argument("--input", help="Folder input (mode server)")
+    ap.add_argument("--output", help="Folder output (mode server)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--rates", help="CSV tabel kurs (currency,date,rate) untuk mengisi Kurs kosong/tidak wajar")
+    args, _ = ap.parse_known_args() # Argumen lain diteruskan ke Qt
+    if args.serve and not (args.input and args.output):
+        ap.error("--serve membutuhkan --input dan --output")
+    return args
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Wajib untuk proses parser terisolasi pada build .exe
+    args = parse_args()
+    
+    if args.serve:
+        from server import run_server
+        run_server(args.input, args.output, args.host, args.port, args.rates)
+        sys.exit(0)
+    
+    from PySide6.QtWidgets import QApplication
+    from ui import MainWindow
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
     w = MainWindow()
     w.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
@@ -4,6 +4,8 @@ import openpyxl
 from datetime import datetime
 # Import addr_to_index yang baru dibuat
 from helpers import clean_currency, detect_currency_from_text, addr_to_index
+from rules import validate_record
+from rates import apply_rate
 
 # ==========================================
 # 1. ABSTRAKSI (ADAPTER PATTERN)
@@ -144,29 +146,10 @@ def extract_common_logic(adapter: ExcelAdapter):
         kurs = clean_currency(adapter.get_by_addr("B4"))
         project_val = clean_currency(adapter.get_by_addr("B5"))
         
-        # --- VALIDASI KELENGKAPAN DATA ---
-        status = "OK"
-        msg = ""
-
-        # Cek Project Value
-        if not project_val or project_val == 0:
-            status = "DATA INCOMPLETE"
-            msg = "Project Value 0/Kosong"
-        
-        # Cek Sub Total (Indikator parsing baris gagal/data kosong)
-        elif not sub_total or sub_total == 0:
-            status = "DATA INCOMPLETE"
-            msg = "Sub Total Kosong/Gagal Parse"
-            
-        # Cek Tanggal
-        elif not date_str:
-            status = "DATA INCOMPLETE"
-            msg = "Tanggal Proyek Kosong"
-
         # 6. Return Data
         return {
-            "status": status,
-            "msg": msg, # Pesan error jika ada
+            "status": "OK", # Divalidasi oleh rules.validate_record
+            "msg": "",
             "_sort_date": date_obj,
             "Project No": project_no,
             "Cust Name": cust_name,
@@ -207,7 +190,8 @@ def parse_xlsx_modern(filepath):
     except Exception as e:
         return {"status": "ERROR", "msg": f"XLSX Error: {str(e)}", "_sort_date": datetime.min}
 
-def extract_dispatcher(filepath):
+def extract_dispatcher(filepath, rates=None):
+    """rates: RateTable (opsional) untuk mengisi Kurs yang kosong / tidak wajar."""
     ext = os.path.splitext(filepath)[1].lower()
     
     if ext == ".xls":
@@ -217,9 +201,6 @@ def extract_dispatcher(filepath):
     else:
         return {"status": "SKIP", "msg": "Format tidak didukung", "_sort_date": datetime.min}
     
-    if data["status"] == "OK":
-        if not data.get("Project No"):
-            data["status"] = "PARSING ERROR"
-            data["msg"] = "Project No Kosong"
-    
-    return data
\ No newline at end of file
+    # Kurs & validasi dijalankan di sini (di proses parser) -> tidak perlu lintasan tambahan
+    apply_rate(data, rates)
+    return validate_record(data)
\ No newline at end of file
@@ -0,0 +1,114 @@
+import os
+import time
+import queue
+import threading
+from collections import deque
+
+# ==========================================
+# PREFETCH (READ-AHEAD FILE KE CACHE OS)
+# ==========================================
+# File dibaca lebih dulu (per chunk, isinya dibuang) sehingga sudah ada di
+# page cache OS saat proses parser membukanya lewat path. Isi file tidak
+# disimpan di proses utama dan tidak dikirim lewat Pipe ke proses parser.
+
+CHUNK_SIZE = 1024 * 1024
+CANCEL_POLL = 0.2 # Detik; interval cek pembatalan selama menunggu read-ahead
+
+def _warm_file(path):
+    """Baca seluruh file per chunk (mengisi page cache). Return True jika berhasil."""
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            while f.read(CHUNK_SIZE):
+                pass
+        return True
+    except OSError:
+        return False
+
+class _ReadJob:
+    def __init__(self, path):
+        self.path = path
+        self.done = threading.Event()
+        self.ok = False
+        self.cancelled = False
+
+class Prefetcher:
+    """
+    Membaca N file berikutnya di thread background selagi file saat ini
+    di-parse, sehingga parser tidak menunggu latensi storage (network drive).
+
+    Iterasi menghasilkan (path, warmed) sesuai urutan paths. warmed False
+    berarti file belum/gagal dibaca lebih dulu (parser tetap membaca sendiri).
+    Ukuran total file yang dibaca di depan dibatasi max_bytes agar read-ahead
+    tidak mendesak keluar file yang belum di-parse dari page cache.
+    Thread pembaca bersifat daemon: pembacaan yang macet (mis. share jaringan
+    putus) tidak menahan proses saat aplikasi ditutup. should_cancel() dicek
+    selama menunggu; jika True, iterasi berhenti tanpa menunggu read_timeout.
+    """
+
+    def __init__(self, paths, max_workers=4, lookahead=8, max_bytes=256 * 1024 * 1024, read_timeout=30,
+                 should_cancel=None):
+        self.paths = list(paths)
+        self.read_timeout = read_timeout # Pembacaan macet -> lanjut, parser yang membaca (dengan timeout)
+        self.should_cancel = should_cancel
+        self.max_workers = max_workers
+        self.lookahead = max(1, lookahead)
+        self.max_bytes = max_bytes
+        self.reserved = 0
+
+    def _worker(self, jobs):
+        while True:
+            job = jobs.get()
+            if job is None: return
+            if not job.cancelled:
+                job.ok = _warm_file(job.path)
+            job.done.set()
+
+    def _wait(self, job):
+        """Tunggu job selesai (maks read_timeout). Return None jika dibatalkan."""
+        deadline = time.monotonic() + self.read_timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if job.done.wait(max(0, min(CANCEL_POLL, remaining))):
+                return job.ok
+            if self.should_cancel and self.should_cancel():
+                return None
+            if remaining <= 0:
+                return False
+
+    def __iter__(self):
+        jobs = queue.Queue()
+        threads = [threading.Thread(target=self._worker, args=(jobs,), daemon=True)
+                   for _ in range(min(self.max_workers, len(self.paths)))]
+        for t in threads: t.start()
+        pending = deque() # (job atau None, ukuran yang dipesan)
+        i = 0
+        try:
+            while pending or i < len(self.paths):
+                # Isi antrian read-ahead selama lookahead & budget masih cukup
+                while i < len(self.paths) and len(pending) < self.lookahead:
+                    path = self.paths[i]
+                    try: size = os.path.getsize(path)
+                    except OSError: size = 0
+
+                    if size > self.max_bytes:
+                        pending.append((path, None, 0))
+                    elif pending and self.reserved + size > self.max_bytes:
+                        break # Backpressure: tunggu file sebelumnya di-parse
+                    else:
+                        self.reserved += size
+                        job = _ReadJob(path)
+                        jobs.put(job)
+                        pending.append((path, job, size))
+                    i += 1
+
+                path, job, size = pending.popleft()
+                warmed = job is not None and self._wait(job)
+                if warmed is None:
+                    pending.appendleft((path, job, size)) # Job ini ikut ditandai batal di finally
+                    return
+                yield path, warmed
+                self.reserved -= size
+        finally:
+            for _, job, _ in pending:
+                if job is not None: job.cancelled = True
+            for _ in threads: jobs.put(None) # Thread yang macet di read() dibiarkan (daemon)
@@ -0,0 +1,160 @@
+import os
+import csv
+from bisect import bisect_left
+from datetime import datetime
+from functools import lru_cache
+
+from helpers import clean_currency, to_number
+from store import file_signature
+
+# ==========================================
+# TABEL KURS (CSV LOKAL)
+# ==========================================
+# Format CSV (baris header wajib):
+#   currency,date,rate
+#   USD,2024-01-02,15500
+#   EUR,02/01/2024,16900.5
+# Kurs = IDR per 1 unit mata uang asing. Untuk tanggal yang tidak ada di
+# tabel dipakai kurs dari tanggal terdekat.
+#
+# Kurs B4 dipakai jika wajar. Jika kosong, <= 1, atau menyimpang lebih dari
+# `tolerance` dari kurs tabel, kurs tabel yang dipakai (kurs_source "tabel").
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d-%b-%y", "%d-%b-%Y")
+
+def _parse_date(text):
+    text = str(text or "").strip()
+    for fmt in DATE_FORMATS:
+        try: return datetime.strptime(text, fmt)
+        except ValueError: pass
+    return None
+
+def _parse_rate(text):
+    text = str(text or "").strip()
+    try: return float(text)
+    except ValueError: return clean_currency(text) # Format lokal "15.500,00"
+
+class RateTable:
+    """
+    Kurs per (currency, tanggal), dimuat dari CSV. Tanggal per currency
+    disimpan terurut (lookup terdekat dengan bisect); hasil lookup disimpan
+    di LRU karena banyak record memakai tanggal yang sama.
+    """
+
+    def __init__(self, rates, signature="", tolerance=0.5, max_gap_days=None, cache_size=4096):
+        """rates: iterable (currency, datetime, kurs)."""
+        self.signature = signature
+        self.tolerance = tolerance
+        self.max_gap_days = max_gap_days
+        by_ccy = {}
+        for ccy, dt, rate in rates:
+            by_ccy.setdefault(ccy.upper(), {})[dt.toordinal()] = rate # Tanggal dobel -> baris terakhir
+        self._days = {}
+        self._rates = {}
+        for ccy, entries in by_ccy.items():
+            days = sorted(entries)
+            self._days[ccy] = days
+            self._rates[ccy] = [entries[d] for d in days]
+        self._lookup_day = lru_cache(maxsize=cache_size)(self._nearest)
+
+    @classmethod
+    def from_csv(cls, path, **kwargs):
+        rates = []
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                row = {str(k).strip().lower(): v for k, v in row.items() if k}
+                ccy = str(row.get("currency") or "").strip()
+                dt = _parse_date(row.get("date"))
+                rate = _parse_rate(row.get("rate"))
+                if ccy and dt and rate > 0:
+                    rates.append((ccy, dt, rate))
+        sig = file_signature(path)
+        signature = f"{os.path.abspath(path)}|{sig[0]}|{sig[1]}" if sig else ""
+        return cls(rates, signature=signature, **kwargs)
+
+    @property
+    def currencies(self):
+        return set(self._days)
+
+    def _nearest(self, ccy, day):
+        days = self._days.get(ccy)
+        if not days: return None
+        i = bisect_left(days, day)
+        # Kandidat: tanggal sebelum & sesudah; seri -> tanggal sebelumnya
+        best = min((j for j in (i - 1, i) if 0 <= j < len(days)), key=lambda j: abs(days[j] - day))
+        if self.max_gap_days is not None and abs(days[best] - day) > self.max_gap_days:
+            return None
+        return self._rates[ccy][best]
+
+    def lookup(self, ccy, date):
+        """Kurs untuk currency pada tanggal terdekat. None jika tidak ada."""
+        if not isinstance(date, datetime) or date == datetime.min: return None
+        return self._lookup_day(str(ccy or "").upper(), date.toordinal())
+
+    def is_plausible(self, kurs, table_rate):
+        if kurs <= 1: return False
+        if table_rate is None: return True
+        return abs(kurs - table_rate) <= table_rate * self.tolerance
+
+_loaded = {}
+
+def load_rate_table(path):
+    """
+    RateTable dari CSV, dimuat ulang hanya jika file berubah (mtime/size).
+    None jika path kosong / file tidak ada / tidak bisa dibaca.
+    """
+    if not path: return None
+    sig = file_signature(path)
+    if sig is None: return None
+    cached = _loaded.get(path)
+    if cached and cached[0] == sig:
+        return cached[1]
+    try:
+        table = RateTable.from_csv(path)
+    except (OSError, csv.Error, UnicodeDecodeError):
+        return None
+    _loaded[path] = (sig, table)
+    return table
+
+def rates_signature(table):
+    return table.signature if table is not None else ""
+
+# ==========================================
+# PENERAPAN KURS KE RECORD
+# ==========================================
+
+def apply_rates(records, table):
+    """
+    Isi Kurs seluruh record sekaligus (per kolom, seperti compute_derived_columns).
+    Kurs asli dari B4 disimpan di "_kurs_b4" sehingga penerapan ulang dengan
+    tabel yang berbeda (atau tanpa tabel) selalu dihitung dari nilai asli.
+    Lookup dilakukan sekali per (currency, tanggal) unik.
+    Hanya record yang berhasil di-parse: status OK (sebelum validasi) atau
+    punya "violations" (sudah divalidasi). ERROR, SKIP, TERKUNCI, dst. tidak
+    punya nilai B4 sehingga tidak diberi Kurs / kurs_source.
+    """
+    records = [r for r in records if r.get("status") == "OK" or "violations" in r]
+    for r in records:
+        r.setdefault("_kurs_b4", r.get("Kurs", 0))
+    raw = [to_number(r["_kurs_b4"]) for r in records]
+    ccys = [str(r.get("Currency") or "IDR").upper() for r in records]
+
+    table_rates = [None] * len(records)
+    if table is not None:
+        keys = {(c, r.get("_sort_date")) for c, r in zip(ccys, records) if c != "IDR"}
+        found = {k: table.lookup(*k) for k in keys}
+        table_rates = [found[(c, r.get("_sort_date"))] if c != "IDR" else None for c, r in zip(ccys, records)]
+
+    for r, kurs, ccy, rate in zip(records, raw, ccys, table_rates):
+        if ccy != "IDR" and rate is not None and not table.is_plausible(kurs, rate):
+            r["Kurs"] = rate
+            r["kurs_source"] = "tabel"
+        else:
+            r["Kurs"] = r["_kurs_b4"]
+            r["kurs_source"] = "B4"
+    return records
+
+def apply_rate(item, table):
+    """Satu record (dipakai di proses parser)."""
+    apply_rates([item], table)
+    return item
@@ -0,0 +1,149 @@
+import os
+import time
+import heapq
+import zipfile
+import threading
+
+from store import file_signature
+
+# ==========================================
+# RETRY FILE TERKUNCI / BELUM SELESAI DITULIS
+# ==========================================
+# File yang gagal di-parse karena sedang dibuka/disimpan Excel atau masih
+# di-copy diberi status TERKUNCI lalu dijadwalkan ulang dengan backoff
+# eksponensial. Hanya file tersebut yang di-parse ulang, setelah ukurannya
+# stabil dan isinya bisa dibaca (tanpa scan ulang seluruh folder).
+
+LOCKED_STATUS = "TERKUNCI"
+LOCKED_MSG = "File sedang dibuka/ditulis, akan dicoba ulang otomatis"
+LOCKED_SIGNATURE = (0, -1) # Tidak pernah cocok -> scan penuh berikutnya tetap mem-parsing ulang
+
+XLS_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" # Header file OLE2 (.xls)
+
+def lock_file_exists(path):
+    """Excel membuat '~$nama.xlsx' (nama panjang: 2 karakter pertama diganti) selama file dibuka."""
+    folder, name = os.path.split(path)
+    return any(os.path.exists(os.path.join(folder, n)) for n in ("~$" + name, "~$" + name[2:]))
+
+def is_readable(path):
+    """File bisa dibuka dan strukturnya lengkap (zip .xlsx utuh / header .xls benar)."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(8)
+    except OSError:
+        return False
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".xlsx":
+        return zipfile.is_zipfile(path) # Central directory ada di akhir file -> gagal jika belum selesai ditulis
+    if ext == ".xls":
+        return head == XLS_MAGIC
+    return True
+
+def is_transient_failure(path, signature_before, recent_seconds=60):
+    """
+    Apakah parse yang gagal kemungkinan karena file sedang dipakai/ditulis:
+    file berubah selama parse, ada lock file Excel, atau file belum bisa
+    dibaca padahal baru saja diubah. File rusak yang lama tidak berubah
+    dianggap error permanen.
+    """
+    signature_after = file_signature(path)
+    if signature_after is None: return False # File dihapus
+    if signature_after != signature_before: return True
+    if lock_file_exists(path): return True
+    if not is_readable(path):
+        try:
+            return time.time() - os.stat(path).st_mtime < recent_seconds
+        except OSError:
+            return False
+    return False
+
+class RetryScheduler:
+    """
+    Antrian retry per path dengan backoff eksponensial (base_delay * 2^n,
+    maksimal max_delay). Setelah max_attempts percobaan, path dilepas
+    (record tetap TERKUNCI sampai scan penuh berikutnya). Thread-safe.
+    """
+
+    def __init__(self, base_delay=2.0, max_delay=60.0, max_attempts=8):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._entries = {} # path -> [attempts, due, signature]
+        self._heap = [] # (due, path); entry lama diabaikan saat pop
+
+    def schedule(self, path, signature=None):
+        """Jadwalkan (ulang) path. Return False jika batas percobaan terlampaui."""
+        with self._lock:
+            entry = self._entries.get(path)
+            attempts = entry[0] + 1 if entry else 1
+            if attempts > self.max_attempts:
+                self._entries.pop(path, None)
+                return False
+            due = time.monotonic() + min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            self._entries[path] = [attempts, due, signature if signature is not None else file_signature(path)]
+            heapq.heappush(self._heap, (due, path))
+            return True
+
+    def expedite(self, paths):
+        """Jadikan path yang sudah terjadwal jatuh tempo sekarang (mis. watcher melihat file selesai ditulis)."""
+        now = time.monotonic()
+        with self._lock:
+            for path in paths:
+                entry = self._entries.get(path)
+                if entry:
+                    entry[1] = now
+                    heapq.heappush(self._heap, (now, path))
+
+    def discard(self, path):
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def __contains__(self, path):
+        with self._lock:
+            return path in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def next_delay(self):
+        """Detik sampai path berikutnya jatuh tempo (None jika antrian kosong)."""
+        with self._lock:
+            self._drop_stale()
+            if not self._heap: return None
+            return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def _drop_stale(self):
+        while self._heap:
+            due, path = self._heap[0]
+            entry = self._entries.get(path)
+            if entry is not None and entry[1] == due: return
+            heapq.heappop(self._heap)
+
+    def pop_due(self):
+        """
+        Path yang jatuh tempo dan siap di-parse ulang: ukuran/mtime sama
+        dengan pengecekan sebelumnya dan isi bisa dibaca. Path yang belum
+        siap dijadwalkan ulang (backoff), path yang hilang dilepas.
+        """
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            self._drop_stale()
+            while self._heap and self._heap[0][0] <= now:
+                _, path = heapq.heappop(self._heap)
+                due.append((path, self._entries[path][2]))
+                self._drop_stale()
+
+        ready = []
+        for path, last_signature in due:
+            signature = file_signature(path)
+            if signature is None:
+                self.discard(path)
+            elif signature == last_signature and is_readable(path):
+                self.discard(path)
+                ready.append(path)
+            else:
+                self.schedule(path, signature) # Masih berubah / belum bisa dibaca
+        return ready
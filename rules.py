@@ -0,0 +1,117 @@
+from helpers import to_number, effective_kurs
+
+# ==========================================
+# ATURAN VALIDASI (DEKLARATIF)
+# ==========================================
+# Setiap aturan: id, check, field, pesan, dan severity.
+#   severity "error"   -> status record diganti (status pertama yang gagal dipakai)
+#   severity "warning" -> status tetap OK, hanya dilaporkan di msg/violations
+# Urutan aturan "error" menentukan status utama (sama dengan urutan cek lama).
+
+RULES = [
+    {"id": "project_value_required", "check": "nonzero", "field": "Project Value",
+     "severity": "error", "status": "DATA INCOMPLETE", "msg": "Project Value 0/Kosong"},
+    {"id": "sub_total_required", "check": "nonzero", "field": "Sub Total",
+     "severity": "error", "status": "DATA INCOMPLETE", "msg": "Sub Total Kosong/Gagal Parse"},
+    {"id": "date_required", "check": "required", "field": "Proj Date",
+     "severity": "error", "status": "DATA INCOMPLETE", "msg": "Tanggal Proyek Kosong"},
+    {"id": "project_no_required", "check": "required", "field": "Project No",
+     "severity": "error", "status": "PARSING ERROR", "msg": "Project No Kosong"},
+    {"id": "project_value_range", "check": "range", "field": "Project Value", "min": 0,
+     "severity": "warning", "msg": "Project Value negatif"},
+    {"id": "total_cost_range", "check": "range", "field": "Total Cost", "min": 0,
+     "severity": "warning", "msg": "Total Cost negatif"},
+    {"id": "kurs_currency", "check": "kurs_currency", "field": "Kurs",
+     "severity": "warning", "msg": "Kurs tidak wajar untuk mata uang asing"},
+    {"id": "kurs_from_table", "check": "not_equal", "field": "kurs_source", "value": "tabel",
+     "severity": "warning", "msg": "Kurs B4 kosong/tidak wajar, diisi dari tabel kurs"},
+    {"id": "cost_ratio", "check": "ratio", "field": "Total Cost", "per": "Project Value", "min": 0, "max": 1.5,
+     "severity": "warning", "msg": "Rasio Total Cost / Project Value (IDR) di luar batas"},
+]
+
+# --- JENIS CEK: fungsi(record, rule) -> True jika lolos ---
+
+def _check_required(item, rule):
+    val = item.get(rule["field"])
+    return bool(str(val).strip()) if val is not None else False
+
+def _check_nonzero(item, rule):
+    return to_number(item.get(rule["field"])) != 0
+
+def _check_range(item, rule):
+    val = to_number(item.get(rule["field"]))
+    if "min" in rule and val < rule["min"]: return False
+    if "max" in rule and val > rule["max"]: return False
+    return True
+
+def _check_not_equal(item, rule):
+    return item.get(rule["field"]) != rule["value"]
+
+def _check_kurs_currency(item, rule):
+    """Mata uang asing harus punya kurs > 1 (IDR per 1 unit asing)."""
+    ccy = item.get("Currency", "IDR")
+    if ccy == "IDR": return True
+    return to_number(item.get(rule["field"])) > 1
+
+def _check_ratio(item, rule):
+    """field / (per * kurs) harus di antara min & max. Dilewati jika pembagi 0."""
+    kurs = effective_kurs(item.get("Currency", "IDR"), to_number(item.get("Kurs")))
+    denom = to_number(item.get(rule["per"])) * kurs
+    if not denom: return True
+    ratio = to_number(item.get(rule["field"])) / denom
+    return rule.get("min", float("-inf")) <= ratio <= rule.get("max", float("inf"))
+
+CHECKS = {
+    "required": _check_required,
+    "nonzero": _check_nonzero,
+    "range": _check_range,
+    "not_equal": _check_not_equal,
+    "kurs_currency": _check_kurs_currency,
+    "ratio": _check_ratio,
+}
+
+def compile_rules(rules):
+    """Ubah daftar aturan menjadi list (rule, fungsi cek). Dilakukan sekali."""
+    compiled = []
+    for rule in rules:
+        if rule["check"] not in CHECKS:
+            raise ValueError(f"Jenis cek tidak dikenal: {rule['check']} (aturan {rule['id']})")
+        compiled.append((rule, CHECKS[rule["check"]]))
+    return compiled
+
+COMPILED_RULES = compile_rules(RULES)
+
+def validate_record(item, compiled=COMPILED_RULES):
+    """
+    Jalankan semua aturan pada satu record hasil parse (status OK).
+    Semua aturan yang gagal dicatat di item["violations"]; status diambil
+    dari aturan error pertama yang gagal.
+    """
+    if item.get("status") != "OK": return item
+
+    violations = []
+    for rule, check in compiled:
+        if not check(item, rule):
+            violations.append({"rule": rule["id"], "severity": rule["severity"], "msg": rule["msg"]})
+            if rule["severity"] == "error" and item["status"] == "OK":
+                item["status"] = rule["status"]
+
+    item["violations"] = violations
+    item["msg"] = "; ".join(v["msg"] for v in violations)
+    return item
+
+def revalidate_record(item, compiled=COMPILED_RULES):
+    """
+    Validasi ulang record yang field-nya diubah setelah parse (mis. Kurs dari
+    tabel kurs). Record yang pernah divalidasi (punya "violations") berasal
+    dari status OK, jadi status dikembalikan ke OK sebelum aturan dijalankan.
+    """
+    if "violations" in item:
+        item["status"] = "OK"
+    return validate_record(item, compiled)
+
+def revalidate_records(records, compiled=COMPILED_RULES):
+    """Validasi ulang satu chunk record (lihat revalidate_record) dalam satu lintasan."""
+    for item in records:
+        revalidate_record(item, compiled)
+    return records
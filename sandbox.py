@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import multiprocessing
+from datetime import datetime
+
+try:
+    import resource # Hanya tersedia di POSIX (Linux/Mac)
+except ImportError:
+    resource = None
+
+if os.name == "nt":
+    import ctypes
+    from ctypes import wintypes
+else:
+    ctypes = None
+
+from helpers import get_cache_dir
+from parsers import extract_dispatcher
+from rates import load_rate_table
+
+# ==========================================
+# 1. BATAS MEMORI DI WINDOWS (JOB OBJECT)
+# ==========================================
+# RLIMIT_AS tidak ada di Windows (build .exe), jadi proses anak dimasukkan
+# ke Job Object dengan batas memori per proses. Alokasi yang melewati batas
+# gagal di proses anak (MemoryError) dan job ikut membunuh anak saat ditutup.
+
+JOB_OBJECT_LIMIT_PROCESS_MEMORY = 0x0100
+JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE = 0x2000
+JOB_OBJECT_EXTENDED_LIMIT_INFORMATION = 9
+PROCESS_SET_QUOTA = 0x0100
+PROCESS_TERMINATE = 0x0001
+
+if ctypes:
+    class _IoCounters(ctypes.Structure):
+        _fields_ = [(name, ctypes.c_ulonglong) for name in (
+            "ReadOperationCount", "WriteOperationCount", "OtherOperationCount",
+            "ReadTransferCount", "WriteTransferCount", "OtherTransferCount")]
+
+    class _BasicLimitInfo(ctypes.Structure):
+        _fields_ = [("PerProcessUserTimeLimit", ctypes.c_int64),
+                    ("PerJobUserTimeLimit", ctypes.c_int64),
+                    ("LimitFlags", wintypes.DWORD),
+                    ("MinimumWorkingSetSize", ctypes.c_size_t),
+                    ("MaximumWorkingSetSize", ctypes.c_size_t),
+                    ("ActiveProcessLimit", wintypes.DWORD),
+                    ("Affinity", ctypes.c_size_t),
+                    ("PriorityClass", wintypes.DWORD),
+                    ("SchedulingClass", wintypes.DWORD)]
+
+    class _ExtendedLimitInfo(ctypes.Structure):
+        _fields_ = [("BasicLimitInformation", _BasicLimitInfo),
+                    ("IoInfo", _IoCounters),
+                    ("ProcessMemoryLimit", ctypes.c_size_t),
+                    ("JobMemoryLimit", ctypes.c_size_t),
+                    ("PeakProcessMemoryUsed", ctypes.c_size_t),
+                    ("PeakJobMemoryUsed", ctypes.c_size_t)]
+
+def _limit_process_memory(pid, mem_limit_mb):
+    """Pasang batas memori ke proses pid lewat Job Object. Mengembalikan handle job (atau None)."""
+    if not ctypes or not mem_limit_mb:
+        return None
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+
+    job = kernel32.CreateJobObjectW(None, None)
+    if not job:
+        return None
+    info = _ExtendedLimitInfo()
+    info.BasicLimitInformation.LimitFlags = JOB_OBJECT_LIMIT_PROCESS_MEMORY | JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE
+    info.ProcessMemoryLimit = int(mem_limit_mb) * 1024 * 1024
+
+    process = kernel32.OpenProcess(PROCESS_SET_QUOTA | PROCESS_TERMINATE, False, pid)
+    ok = bool(process) and kernel32.SetInformationJobObject(
+        wintypes.HANDLE(job), JOB_OBJECT_EXTENDED_LIMIT_INFORMATION, ctypes.byref(info), ctypes.sizeof(info)
+    ) and kernel32.AssignProcessToJobObject(wintypes.HANDLE(job), wintypes.HANDLE(process))
+    if process:
+        kernel32.CloseHandle(wintypes.HANDLE(process))
+    if not ok:
+        kernel32.CloseHandle(wintypes.HANDLE(job))
+        return None
+    return job
+
+def _job_hit_limit(job):
+    """True jika pemakaian memori puncak proses di job sudah menyentuh batasnya."""
+    if not ctypes or not job:
+        return False
+    info = _ExtendedLimitInfo()
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    if not kernel32.QueryInformationJobObject(wintypes.HANDLE(job), JOB_OBJECT_EXTENDED_LIMIT_INFORMATION,
+                                              ctypes.byref(info), ctypes.sizeof(info), None):
+        return False
+    # Alokasi yang ditolak tidak ikut dihitung, jadi beri sedikit kelonggaran
+    return info.PeakProcessMemoryUsed >= info.ProcessMemoryLimit * 0.9
+
+def _close_job(job):
+    if ctypes and job:
+        ctypes.WinDLL("kernel32").CloseHandle(wintypes.HANDLE(job))
+
+# ==========================================
+# 2. PROSES ANAK (ISOLASI PARSER)
+# ==========================================
+
+def _child_loop(conn, mem_limit_mb):
+    """Loop di proses terpisah: terima path, kirim balik hasil parse."""
+    if resource and mem_limit_mb:
+        try:
+            limit = int(mem_limit_mb) * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except: pass
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None: break
+        filepath, rates_path = job
+
+        try:
+            # Tabel kurs di-cache per proses, dimuat ulang jika file CSV berubah
+            data = extract_dispatcher(filepath, rates=load_rate_table(rates_path))
+        except MemoryError:
+            data = {"status": "ERROR", "msg": f"Melebihi batas memori ({mem_limit_mb} MB)", "_sort_date": datetime.min}
+        conn.send(data)
+
+class IsolatedParser:
+    """
+    Menjalankan extract_dispatcher di proses terpisah dengan batas waktu
+    dan memori per file. Jika waktu habis / proses crash, proses dibunuh
+    lalu dibuat ulang, dan file tersebut diberi status ERROR.
+    """
+
+    def __init__(self, timeout=60, mem_limit_mb=1024):
+        self.timeout = timeout
+        self.mem_limit_mb = mem_limit_mb
+        self.process = None
+        self.conn = None
+        self.job = None # Job Object (Windows) yang membatasi memori proses anak
+
+    def _spawn(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_child_loop, args=(child_conn, self.mem_limit_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.job = _limit_process_memory(self.process.pid, self.mem_limit_mb)
+
+    def _kill(self):
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join()
+        if self.conn is not None:
+            self.conn.close()
+        _close_job(self.job)
+        self.process = None
+        self.conn = None
+        self.job = None
+
+    def parse(self, filepath, rates_path=None):
+        """
+        Hanya path yang dikirim ke proses parser (file dibaca di sana, biasanya
+        dari page cache hasil Prefetcher). rates_path: CSV tabel kurs (opsional).
+        """
+        if self.process is None or not self.process.is_alive():
+            self._kill()
+            self._spawn()
+
+        try:
+            self.conn.send((filepath, rates_path))
+            if self.conn.poll(self.timeout):
+                return self.conn.recv()
+            reason = f"Timeout: parsing lebih dari {self.timeout} detik"
+        except (EOFError, OSError):
+            if _job_hit_limit(self.job):
+                reason = f"Melebihi batas memori ({self.mem_limit_mb} MB)"
+            else:
+                reason = "Proses parser berhenti (file rusak / melebihi batas memori)"
+
+        # Worker macet atau mati -> bunuh dan daur ulang
+        self._kill()
+        return {"status": "ERROR", "msg": reason, "_sort_date": datetime.min}
+
+    def close(self):
+        if self.conn is not None and self.process is not None and self.process.is_alive():
+            try: self.conn.send(None)
+            except: pass
+            self.process.join(1)
+        self._kill()
+
+# ==========================================
+# 3. CATATAN FILE LAMBAT
+# ==========================================
+
+class SlowFileRegistry:
+    """
+    Menyimpan daftar file yang parsingnya lambat (atau timeout) ke JSON,
+    agar scan berikutnya memproses file tersebut paling akhir.
+    """
+
+    def __init__(self, threshold=5.0, filename="slow_files.json"):
+        self.threshold = threshold
+        self.path = os.path.join(get_cache_dir(), filename)
+        self.entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except: pass
+
+    def record(self, filepath, elapsed, timed_out=False):
+        if timed_out or elapsed >= self.threshold:
+            self.entries[filepath] = {"elapsed": round(elapsed, 2), "timed_out": timed_out, "last_seen": time.time()}
+        else:
+            self.entries.pop(filepath, None)
+
+    def order(self, paths):
+        """File cepat dulu, file lambat di belakang (urut dari yang paling lambat terakhir)."""
+        def key(p):
+            e = self.entries.get(p)
+            if not e: return (0, 0)
+            return (1, float("inf") if e.get("timed_out") else e.get("elapsed", 0))
+        return sorted(paths, key=key)
+
+    def save(self):
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=1)
+        except: pass
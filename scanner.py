@@ -0,0 +1,161 @@
+import os
+import time
+from datetime import datetime
+
+from sandbox import IsolatedParser, SlowFileRegistry
+from store import file_signature
+from prefetch import Prefetcher
+from rates import load_rate_table, rates_signature, apply_rates
+from rules import revalidate_records
+from helpers import iter_chunks
+from retry import is_transient_failure, LOCKED_STATUS, LOCKED_MSG, LOCKED_SIGNATURE
+
+# ==========================================
+# SCAN FOLDER (TANPA QT)
+# ==========================================
+# Dipakai oleh PreviewWorker (GUI) dan mode server (server.py).
+
+def list_input_files(folder_path):
+    """Path semua file Excel di folder input (tanpa lock file ~$)."""
+    try:
+        names = [f for f in os.listdir(folder_path) if f.lower().endswith(('.xls', '.xlsx'))]
+    except:
+        return []
+    return [os.path.join(folder_path, f) for f in names if not f.startswith("~$")]
+
+def mark_duplicates(results):
+    """Record OK dengan Project No yang sama diberi status DUPLIKAT."""
+    id_counts = {}
+    for item in results:
+        if item["status"] == "OK":
+            pid = str(item.get("Project No", "")).strip()
+            if pid:
+                id_counts[pid] = id_counts.get(pid, 0) + 1
+    
+    for item in results:
+        if item["status"] == "OK":
+            pid = str(item.get("Project No", "")).strip()
+            if pid and id_counts.get(pid, 0) > 1:
+                item["status"] = "DUPLIKAT" 
+
+def refresh_rates(store, cached, table, chunk_size=500):
+    """
+    Terapkan ulang tabel kurs ke record yang sudah ada di store (tanpa
+    parse ulang), per chunk. cached: list (path, signature).
+    """
+    for chunk in iter_chunks(cached, chunk_size):
+        entries = [(path, store.get(path, sig), sig) for path, sig in chunk]
+        entries = [e for e in entries if e[1] is not None]
+        records = [data for _, data, _ in entries]
+        apply_rates(records, table)
+        revalidate_records(records)
+        store.put_many(entries)
+
+def parse_file(path, signature, parser, store, rates_path=None, retry=None):
+    """
+    Parse satu file lalu simpan ke store. Jika gagal karena file sedang
+    dibuka/ditulis, record diberi status TERKUNCI, disimpan dengan signature
+    yang tidak akan cocok (tidak di-cache), dan dijadwalkan ke retry.
+    """
+    data = parser.parse(path, rates_path)
+    data["filename"] = os.path.basename(path)
+    data["path"] = path
+    if data.get("status") == "ERROR" and is_transient_failure(path, signature):
+        data["status"] = LOCKED_STATUS
+        data["msg"] = f"{LOCKED_MSG} ({data.get('msg', '')})"
+        store.put(path, data, LOCKED_SIGNATURE)
+        if retry is not None: retry.schedule(path)
+        return data
+    if retry is not None: retry.discard(path)
+    store.put(path, data, signature)
+    return data
+
+def retry_files(paths, store, parser, rates_path=None, retry=None):
+    """
+    Parse ulang file tertentu saja (mis. dari RetryScheduler), tanpa scan
+    folder. Return list record; cek duplikat dilakukan oleh pemanggil.
+    """
+    results = []
+    for path in paths:
+        signature = file_signature(path)
+        if signature is None: continue
+        results.append(parse_file(path, signature, parser, store, rates_path, retry))
+    return results
+
+def scan_folder(folder_path, store, parser=None, progress=None, should_cancel=None,
+                timeout=60, mem_limit_mb=1024, prefetch_workers=4, prefetch_budget_mb=256,
+                collect=True, rates_path=None, retry=None):
+    """
+    Parse semua file di folder. File yang tidak berubah diambil dari store.
+    progress(persen) dipanggil tiap file; jika should_cancel() bernilai True
+    scan berhenti dan fungsi mengembalikan None.
+    parser boleh diberikan (IsolatedParser yang tetap hidup antar scan);
+    jika tidak, parser sementara dibuat dan ditutup di akhir scan.
+    File yang perlu di-parse dibaca lebih dulu oleh Prefetcher (read-ahead)
+    sehingga pembacaan file berikutnya berjalan bersamaan dengan parsing.
+    collect=False (store berupa RecordDB): record tidak dikumpulkan di memori;
+    hasil scan dikembalikan sebagai RecordSource yang dibaca per chunk.
+    rates_path: CSV tabel kurs (opsional). Jika tabel berubah sejak scan
+    terakhir, Kurs record di store diperbarui tanpa parse ulang.
+    retry: RetryScheduler (opsional) untuk file yang sedang dibuka/ditulis.
+    """
+    # File yang sebelumnya lambat/timeout diproses paling akhir
+    slow_registry = SlowFileRegistry()
+    all_paths = slow_registry.order(list_input_files(folder_path))
+    
+    store.prune(all_paths)
+    total = len(all_paths)
+    results = []
+    
+    # File yang berubah (tidak ada di store) saja yang perlu dibaca & di-parse
+    signatures = {path: file_signature(path) for path in all_paths}
+    to_parse = [path for path in all_paths if not store.has(path, signatures[path])]
+    parse_set = set(to_parse)
+    
+    # Tabel kurs berubah (atau dilepas) -> perbarui Kurs record yang sudah ada
+    rates = load_rate_table(rates_path)
+    if store.rates_signature != rates_signature(rates):
+        refresh_rates(store, [(p, signatures[p]) for p in all_paths if p not in parse_set], rates)
+        store.rates_signature = rates_signature(rates)
+    
+    prefetcher = iter(Prefetcher(to_parse, max_workers=prefetch_workers,
+                                 max_bytes=prefetch_budget_mb * 1024 * 1024, should_cancel=should_cancel))
+    
+    # 1. PARSE (tiap file di proses terisolasi dengan batas waktu & memori)
+    own_parser = parser is None
+    if own_parser:
+        parser = IsolatedParser(timeout=timeout, mem_limit_mb=mem_limit_mb)
+    try:
+        for i, path in enumerate(all_paths):
+            if should_cancel and should_cancel():
+                return None
+            
+            signature = signatures[path]
+            if path in parse_set:
+                next(prefetcher, None) # Urutan prefetch = urutan to_parse; file sudah di page cache
+                if should_cancel and should_cancel():
+                    return None # Dibatalkan selagi menunggu read-ahead
+                t0 = time.monotonic()
+                data = parse_file(path, signature, parser, store, rates_path, retry)
+                elapsed = time.monotonic() - t0
+                slow_registry.record(path, elapsed, timed_out=elapsed >= parser.timeout)
+            elif collect:
+                data = store.get(path, signature)
+            
+            if collect: results.append(data)
+            if progress and total > 0: progress(int((i+1)/total * 100))
+    finally:
+        prefetcher.close()
+        if own_parser: parser.close()
+        slow_registry.save()
+
+    if not collect:
+        store.mark_duplicates()
+        return store.records()
+
+    # 2. LOGIKA DUPLIKAT
+    mark_duplicates(results)
+    
+    # 3. SORTING BY DATE (DEFAULT)
+    results.sort(key=lambda x: x.get("_sort_date", datetime.min))
+    return results
@@ -0,0 +1,304 @@
+import os
+import json
+import asyncio
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+
+from sandbox import IsolatedParser
+from store import ResultStore
+from scanner import scan_folder, retry_files, mark_duplicates
+from summary import build_summary_workbook, partition_hash
+from snapshot import Snapshot, record_key
+from retry import RetryScheduler
+
+# ==========================================
+# MODE SERVER (HTTP LOKAL)
+# ==========================================
+# Menjalankan scan & generate tanpa GUI. Cache hasil parse (ResultStore)
+# dan proses parser (IsolatedParser) tetap hidup di memori, sehingga
+# request berulang tidak mem-parsing ulang file yang tidak berubah.
+#
+#   POST /scan                        -> mulai scan (jika belum berjalan)
+#   GET  /status                      -> status scan & jumlah record
+#   GET  /records?offset=0&limit=100  -> record hasil scan (opsional: &status=OK)
+#   GET  /summary?values=1            -> download file summary (.xlsx)
+#   GET  /changes                     -> diff scan / retry terakhir vs data sebelumnya
+#   GET  /events                      -> progress scan (Server-Sent Events)
+
+STATUS_TEXT = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 409: "Conflict", 500: "Internal Server Error"}
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return None if value == datetime.min else value.isoformat()
+    return str(value)
+
+def record_to_json(item):
+    """Record untuk API: field internal (_sort_date) diganti ISO date."""
+    out = {k: v for k, v in item.items() if not k.startswith("_")}
+    out["Proj Date ISO"] = _json_default(item.get("_sort_date", datetime.min))
+    return out
+
+class SummaryService:
+    def __init__(self, input_folder, output_folder, timeout=60, mem_limit_mb=1024, rates_path=None):
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.rates_path = rates_path
+        self.store = ResultStore()
+        self.parser = IsolatedParser(timeout=timeout, mem_limit_mb=mem_limit_mb)
+        self.retry = RetryScheduler() # File terkunci dari scan terakhir
+        self.retry_handle = None
+        self.parse_lock = asyncio.Lock() # Scan & retry memakai parser yang sama, bergantian
+        self.records = []
+        self.snapshot = None
+        self.last_diff = None
+        self.progress = 0
+        self.scan_task = None
+        self.rescan_pending = False
+        self.subscribers = set()
+        self.summary_cache = {} # (hash, values) -> path
+        self.summary_lock = asyncio.Lock() # Satu build summary sekaligus (file output sama)
+
+    # --- SCAN ---
+
+    @property
+    def scanning(self):
+        return self.scan_task is not None and not self.scan_task.done()
+
+    def request_scan(self):
+        """Mulai scan; jika scan sedang berjalan, jadwalkan satu scan ulang."""
+        if self.scanning:
+            self.rescan_pending = True
+            return False
+        self.scan_task = asyncio.get_running_loop().create_task(self._run_scan())
+        return True
+
+    async def _run_scan(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self.rescan_pending = False
+            self.progress = 0
+            self.publish("progress", {"progress": 0})
+
+            def on_progress(pct):
+                loop.call_soon_threadsafe(self._set_progress, pct)
+
+            # Parser tunggal dipakai bergantian -> scan dijalankan di satu thread
+            async with self.parse_lock:
+                results = await loop.run_in_executor(None, lambda: scan_folder(
+                    self.input_folder, self.store, parser=self.parser, progress=on_progress,
+                    rates_path=self.rates_path, retry=self.retry))
+                self.records = results or []
+                snapshot = Snapshot.from_records(self.records)
+                self.last_diff = snapshot.diff(self.snapshot)
+                self.snapshot = snapshot
+            d = self.last_diff
+            self.publish("done", {"records": len(self.records), "added": len(d.added),
+                                  "removed": len(d.removed), "modified": len(d.modified)})
+            if not self.rescan_pending: break
+        self._schedule_retry()
+
+    def _schedule_retry(self):
+        """
+        Cek ulang file terkunci saat jatuh tempo (backoff). File yang sudah
+        bisa dibaca di-parse ulang sendiri (tanpa scan folder), lalu status
+        duplikat grup Project No-nya dihitung ulang.
+        """
+        delay = self.retry.next_delay()
+        if delay is None or self.retry_handle is not None: return
+        loop = asyncio.get_running_loop()
+        self.retry_handle = loop.call_later(delay, self._on_retry_due)
+
+    def _on_retry_due(self):
+        self.retry_handle = None
+        if self.scanning: return # Scan yang berjalan menjadwalkan ulang di akhir
+        ready = self.retry.pop_due()
+        if ready:
+            asyncio.get_running_loop().create_task(self._run_retry(ready))
+        else:
+            self._schedule_retry()
+
+    async def _run_retry(self, paths):
+        loop = asyncio.get_running_loop()
+        async with self.parse_lock:
+            if not self.scanning: # Scan yang dimulai sementara itu sudah mencakup file ini
+                retried = await loop.run_in_executor(None, lambda: retry_files(
+                    paths, self.store, self.parser, self.rates_path, retry=self.retry))
+                self._apply_retried(retried)
+        self._schedule_retry()
+
+    def _apply_retried(self, retried):
+        """
+        Ganti record hasil retry di self.records dan hitung ulang duplikat
+        hanya untuk grup Project No yang terpengaruh (record lain tidak
+        disentuh). List baru dibuat agar build summary yang sedang membaca
+        list lama tidak terganggu.
+        """
+        by_path = {r["path"]: r for r in retried}
+        pids = {str(r.get("Project No", "")).strip() for r in retried}
+        if self.snapshot is not None:
+            pids |= {self.snapshot.fields(record_key(r)).get("Project No", "") for r in retried}
+        pids.discard("")
+
+        records, affected = [], []
+        for item in self.records:
+            item = by_path.get(item.get("path"), item)
+            if item.get("path") in by_path or str(item.get("Project No", "")).strip() in pids:
+                item = dict(item)
+                if item.get("status") == "DUPLIKAT": item["status"] = "OK" # Dihitung ulang di bawah
+                affected.append(item)
+            records.append(item)
+        mark_duplicates(affected)
+        self.records = records
+        if self.snapshot is None: self.snapshot = Snapshot()
+        self.last_diff = d = self.snapshot.update(affected)
+        self.publish("retried", {"files": len(retried), "added": len(d.added),
+                                 "removed": len(d.removed), "modified": len(d.modified)})
+
+    def _set_progress(self, pct):
+        self.progress = pct
+        self.publish("progress", {"progress": pct})
+
+    def publish(self, event, data):
+        for queue in list(self.subscribers):
+            queue.put_nowait((event, data))
+
+    # --- SUMMARY ---
+
+    def summary_path(self, use_formulas):
+        """Summary dibuat ulang hanya jika record berubah sejak pembuatan terakhir."""
+        key = (partition_hash(self.records, use_formulas), use_formulas)
+        path = self.summary_cache.get(key)
+        if path and os.path.exists(path):
+            return path
+
+        year = datetime.now().year
+        path = os.path.join(self.output_folder, f"PCM {year} SUMMARY.xlsx")
+        build_summary_workbook(path, f"PCM {year} SUMMARY", self.records, use_formulas)
+        self.summary_cache = {key: path}
+        return path
+
+    def close(self):
+        if self.retry_handle is not None: self.retry_handle.cancel()
+        self.parser.close()
+
+# ==========================================
+# HTTP HANDLER (asyncio streams, tanpa dependency tambahan)
+# ==========================================
+
+async def _send(writer, code, body=b"", content_type="application/json", extra_headers=None):
+    headers = [f"HTTP/1.1 {code} {STATUS_TEXT.get(code, '')}",
+               f"Content-Type: {content_type}",
+               f"Content-Length: {len(body)}",
+               "Connection: close"]
+    headers += extra_headers or []
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+async def _send_json(writer, code, payload):
+    body = json.dumps(payload, default=_json_default, ensure_ascii=False).encode("utf-8")
+    await _send(writer, code, body)
+
+def _int_param(params, name, default):
+    try:
+        return int(params.get(name, [default])[0])
+    except (TypeError, ValueError):
+        return default
+
+async def handle_client(service, reader, writer):
+    try:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""): pass # Abaikan header
+        if not request_line:
+            return
+        method, target = request_line.split(" ")[:2]
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+
+        if url.path == "/scan":
+            if method != "POST":
+                await _send_json(writer, 405, {"error": "Gunakan POST"}); return
+            started = service.request_scan()
+            await _send_json(writer, 202, {"status": "started" if started else "queued"})
+
+        elif url.path == "/status":
+            await _send_json(writer, 200, {"scanning": service.scanning, "progress": service.progress,
+                                           "records": len(service.records), "cached_files": len(service.store)})
+
+        elif url.path == "/records":
+            items = service.records
+            status = params.get("status", [None])[0]
+            if status:
+                items = [r for r in items if r.get("status") == status]
+            offset = max(0, _int_param(params, "offset", 0))
+            limit = min(1000, max(1, _int_param(params, "limit", 100)))
+            await _send_json(writer, 200, {"total": len(items), "offset": offset, "limit": limit,
+                                           "items": [record_to_json(r) for r in items[offset:offset + limit]]})
+
+        elif url.path == "/summary":
+            if service.scanning:
+                await _send_json(writer, 409, {"error": "Scan sedang berjalan"}); return
+            use_formulas = params.get("values", ["0"])[0] not in ("1", "true")
+            loop = asyncio.get_running_loop()
+            # Request bersamaan menunggu build yang sedang berjalan, lalu memakai hasil cache-nya
+            async with service.summary_lock:
+                path = await loop.run_in_executor(None, service.summary_path, use_formulas)
+                with open(path, "rb") as f:
+                    body = f.read()
+            await _send(writer, 200, body,
+                        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        [f'Content-Disposition: attachment; filename="{os.path.basename(path)}"'])
+
+        elif url.path == "/changes":
+            d = service.last_diff
+            if d is None:
+                await _send_json(writer, 404, {"error": "Belum ada scan"}); return
+            modified = {k: {f: {"old": a, "new": b} for f, (a, b) in c.items()} for k, c in d.modified.items()}
+            await _send_json(writer, 200, {"added": d.added, "removed": d.removed, "modified": modified})
+
+        elif url.path == "/events":
+            await _stream_events(service, writer)
+
+        else:
+            await _send_json(writer, 404, {"error": "Endpoint tidak ditemukan"})
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    except Exception as e:
+        try: await _send_json(writer, 500, {"error": str(e)})
+        except: pass
+    finally:
+        writer.close()
+
+async def _stream_events(service, writer):
+    queue = asyncio.Queue()
+    service.subscribers.add(queue)
+    try:
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n")
+        queue.put_nowait(("status", {"scanning": service.scanning, "progress": service.progress}))
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=15)
+                writer.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+            except asyncio.TimeoutError:
+                writer.write(b": keep-alive\n\n")
+            await writer.drain()
+    finally:
+        service.subscribers.discard(queue)
+
+async def serve(input_folder, output_folder, host="127.0.0.1", port=8765, rates_path=None):
+    service = SummaryService(input_folder, output_folder, rates_path=rates_path)
+    server = await asyncio.start_server(lambda r, w: handle_client(service, r, w), host, port)
+    print(f"PCM Summary Generator server: http://{host}:{port}  (input: {input_folder})")
+    service.request_scan() # Panaskan cache sejak awal
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+def run_server(input_folder, output_folder, host="127.0.0.1", port=8765, rates_path=None):
+    try:
+        asyncio.run(serve(input_folder, output_folder, host, port, rates_path))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,183 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+from helpers import to_number
+
+# ==========================================
+# SNAPSHOT & DIFF ANTAR SCAN
+# ==========================================
+# Snapshot = {key record: (hash, nilai field dalam JSON)} dengan key = nama
+# file. Diff dua snapshot cukup satu lintasan O(n): record dengan hash sama
+# dilewati, field hanya di-decode & dibandingkan jika hash-nya berbeda.
+# Nilai field disimpan sebagai teks JSON agar snapshot folder besar tetap kecil.
+#
+# Snapshot: di memori (list record, mode server). StoredSnapshot: hash &
+# field per record ada di RecordDB (SQLite) dan diff dijalankan sebagai
+# query SQL, sehingga memori GUI tidak bergantung pada jumlah record.
+
+# (field, jenis) yang dibandingkan antar scan
+DIFF_FIELDS = [
+    ("status", "text"),
+    ("Project No", "text"),
+    ("Cust Name", "text"),
+    ("Proj Date", "text"),
+    ("Currency", "text"),
+    ("Kurs", "num"),
+    ("Project Value", "num"),
+    ("Sub Total", "num"),
+    ("Penalty", "num"),
+    ("Warranty", "num"),
+    ("Total Cost", "num"),
+    ("CM Booked", "num"),
+    ("CR Booked", "num"),
+]
+FIELD_NAMES = [f for f, _ in DIFF_FIELDS]
+
+def record_key(item):
+    return item.get("filename") or os.path.basename(item.get("path", ""))
+
+def record_fields(item):
+    """Nilai field yang dibandingkan, dinormalisasi (angka -> float, teks -> str)."""
+    out = []
+    for field, kind in DIFF_FIELDS:
+        val = item.get(field)
+        if kind == "num":
+            out.append(float(to_number(val)))
+        else:
+            out.append(str(val).strip() if val is not None else "")
+    return out
+
+def fields_hash(fields_json):
+    return hashlib.blake2b(fields_json.encode("utf-8"), digest_size=8).hexdigest()
+
+class SnapshotDiff:
+    """Hasil diff: added/removed = list key, modified = {key: {field: (lama, baru)}}."""
+
+    def __init__(self, added=None, removed=None, modified=None):
+        self.added = added or []
+        self.removed = removed or []
+        self.modified = modified or {}
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified)
+
+    def changed_fields(self):
+        """Semua field yang berubah pada record yang dimodifikasi."""
+        return {field for changes in self.modified.values() for field in changes}
+
+    def summary(self):
+        return f"{len(self.added)} baru, {len(self.removed)} dihapus, {len(self.modified)} berubah"
+
+    def merge(self, other):
+        """Gabungkan diff lain (mis. retry yang selesai sebelum scan dimulai) ke diff ini."""
+        added, removed = set(self.added), set(self.removed)
+        self.added += [k for k in other.added if k not in added]
+        self.removed += [k for k in other.removed if k not in removed]
+        for key, changes in other.modified.items():
+            self.modified.setdefault(key, {}).update(changes)
+        return self
+
+class Snapshot:
+    def __init__(self, entries=None, taken_at=None):
+        self.entries = entries if entries is not None else {} # key -> (hash, fields_json)
+        self.taken_at = taken_at or datetime.now().isoformat(timespec="seconds")
+
+    @classmethod
+    def from_records(cls, records):
+        """Satu lintasan atas records (list atau RecordSource yang di-stream)."""
+        entries = {}
+        for item in records:
+            fields_json = json.dumps(record_fields(item), ensure_ascii=False)
+            entries[record_key(item)] = (fields_hash(fields_json), fields_json)
+        return cls(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def fields(self, key):
+        """Nilai field satu record sebagai dict ({} jika key tidak ada)."""
+        entry = self.entries.get(key)
+        return dict(zip(FIELD_NAMES, json.loads(entry[1]))) if entry else {}
+
+    def update(self, records):
+        """Perbarui entry record tertentu saja (mis. hasil retry). Return SnapshotDiff record tersebut."""
+        changed = Snapshot.from_records(records)
+        previous = Snapshot({k: self.entries[k] for k in changed.entries if k in self.entries})
+        self.entries.update(changed.entries)
+        return changed.diff(previous)
+
+    def diff(self, previous):
+        """Perubahan dari snapshot previous ke snapshot ini. previous None -> semua baru."""
+        old = previous.entries if previous is not None else {}
+        added, modified = [], {}
+        for key, (digest, fields_json) in self.entries.items():
+            prev = old.get(key)
+            if prev is None:
+                added.append(key)
+            elif prev[0] != digest:
+                pairs = zip(FIELD_NAMES, json.loads(prev[1]), json.loads(fields_json))
+                modified[key] = {name: (a, b) for name, a, b in pairs if a != b}
+        removed = [key for key in old if key not in self.entries]
+        return SnapshotDiff(added, removed, modified)
+
+SCAN_SNAPSHOT = "scan" # Snapshot scan terakhir di RecordDB (dasar diff scan / retry berikutnya)
+
+def _stored_fields(status, fields_json):
+    """Field dari kolom snapshot RecordDB; status diganti status setelah cek duplikat."""
+    values = json.loads(fields_json)
+    values[0] = status
+    return dict(zip(FIELD_NAMES, values))
+
+class StoredSnapshot:
+    """
+    Snapshot di RecordDB: name None = isi tabel records saat ini, selain itu
+    snapshot yang disimpan dengan RecordDB.save_snapshot(name). Interface
+    fields/diff/taken_at sama dengan Snapshot (dipakai change_rows).
+    """
+
+    def __init__(self, db, name=None, taken_at=None):
+        self.db = db
+        self.name = name
+        self.taken_at = taken_at or (db.snapshot_taken_at(name) if name else None)
+
+    def fields(self, key):
+        row = self.db.snapshot_fields(key, self.name)
+        return _stored_fields(*row) if row else {}
+
+    def diff(self, previous, keys=None):
+        """
+        Perubahan dari snapshot previous (StoredSnapshot di DB yang sama,
+        atau None -> semua baru) ke isi records saat ini. keys: batasi ke
+        key tersebut (+ record dengan Project No yang sama).
+        """
+        added, removed, rows = self.db.snapshot_changes(previous.name if previous is not None else None, keys)
+        modified = {}
+        for key, old_status, old_json, new_status, new_json in rows:
+            old, new = _stored_fields(old_status, old_json), _stored_fields(new_status, new_json)
+            changes = {name: (old[name], new[name]) for name in FIELD_NAMES if old[name] != new[name]}
+            if changes: modified[key] = changes
+        return SnapshotDiff(added, removed, modified)
+
+def change_rows(diff, current, previous):
+    """Baris untuk sheet perubahan: (jenis, file, project no, field, nilai lama, nilai baru)."""
+    for key in sorted(diff.added):
+        yield ("BARU", key, current.fields(key).get("Project No", ""), "", None, None)
+    for key in sorted(diff.removed):
+        yield ("DIHAPUS", key, previous.fields(key).get("Project No", ""), "", None, None)
+    for key in sorted(diff.modified):
+        pid = current.fields(key).get("Project No", "")
+        for field, (old, new) in diff.modified[key].items():
+            yield ("BERUBAH", key, pid, field, old, new)
+
+GENERATE_SNAPSHOT = "pcm_snapshot.sqlite" # Di folder output: data saat generate terakhir
+
+def load_generate_snapshot(output_folder, db, name="generate"):
+    """Snapshot generate terakhir, disalin ke db (StoredSnapshot), atau None jika belum ada."""
+    taken_at = db.load_snapshot_file(os.path.join(output_folder, GENERATE_SNAPSHOT), name)
+    return StoredSnapshot(db, name, taken_at) if taken_at else None
+
+def save_generate_snapshot(output_folder, db):
+    """Simpan isi records db saat ini sebagai snapshot generate."""
+    db.save_snapshot_file(os.path.join(output_folder, GENERATE_SNAPSHOT))
@@ -0,0 +1,546 @@
+import os
+import json
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from datetime import datetime
+
+from helpers import get_cache_dir, to_number
+from snapshot import FIELD_NAMES, record_fields, fields_hash
+
+# ==========================================
+# RESULT STORE (CACHE HASIL PARSING)
+# ==========================================
+
+def file_signature(path):
+    """Tanda tangan file (mtime, size). None jika file tidak bisa di-stat."""
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+class ResultStore:
+    """
+    Menyimpan hasil parse per path beserta signature file-nya.
+    Hasil dipakai ulang selama file tidak berubah, sehingga scan yang
+    dibatalkan tidak membuang pekerjaan yang sudah selesai.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.rates_signature = "" # Tabel kurs yang dipakai untuk hasil di store
+
+    def get(self, path, signature=None):
+        if signature is None:
+            signature = file_signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None or signature is None or entry[0] != signature:
+            return None
+        return dict(entry[1]) # Salinan, karena worker mengubah status (mis. DUPLIKAT)
+
+    def has(self, path, signature):
+        with self._lock:
+            entry = self._entries.get(path)
+        return entry is not None and signature is not None and entry[0] == signature
+
+    def put(self, path, data, signature=None):
+        if signature is None:
+            signature = file_signature(path)
+        if signature is None: return
+        with self._lock:
+            self._entries[path] = (signature, dict(data))
+
+    def put_many(self, entries):
+        """entries: iterable (path, data, signature)."""
+        for path, data, signature in entries:
+            self.put(path, data, signature)
+
+    def prune(self, valid_paths):
+        """Buang entry milik file yang sudah tidak ada di folder."""
+        valid_paths = set(valid_paths)
+        with self._lock:
+            for path in [p for p in self._entries if p not in valid_paths]:
+                del self._entries[path]
+
+    def __len__(self):
+        return len(self._entries)
+
+# ==========================================
+# RECORD DB (SQLITE, UNTUK FOLDER BESAR)
+# ==========================================
+# Hasil parse disimpan di SQLite (satu file per folder input) dan dibaca
+# per halaman oleh tabel preview & generator, sehingga memori tidak
+# bertambah seiring jumlah file. Kolom bertipe dipakai untuk sort/filter.
+
+CACHE_VERSION = 3 # Naikkan jika format record / logika parser / snapshot.DIFF_FIELDS berubah
+
+# (kolom SQL, key record, tipe)
+TYPED_COLUMNS = [
+    ("filename", "filename", "TEXT"),
+    ("status", "status", "TEXT"),
+    ("pid", "Project No", "TEXT"),
+    ("cust_name", "Cust Name", "TEXT"),
+    ("sort_date", "_sort_date", "TEXT"),
+    ("currency", "Currency", "TEXT"),
+    ("kurs", "Kurs", "REAL"),
+    ("project_value", "Project Value", "REAL"),
+    ("sub_total", "Sub Total", "REAL"),
+    ("penalty", "Penalty", "REAL"),
+    ("warranty", "Warranty", "REAL"),
+    ("total_cost", "Total Cost", "REAL"),
+    ("cm_booked", "CM Booked", "REAL"),
+    ("cr_booked", "CR Booked", "REAL"),
+]
+SQL_COLUMN = {key: col for col, key, _ in TYPED_COLUMNS}
+SQL_COLUMN.update({"status": "scan_status", "Proj Date": "sort_date"}) # Key tampilan tabel
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__dt__": value.isoformat()}
+    return str(value)
+
+def _decode(obj):
+    if "__dt__" in obj:
+        return datetime.fromisoformat(obj["__dt__"])
+    return obj
+
+def _typed_value(item, key, sql_type):
+    val = item.get(key)
+    if key == "_sort_date":
+        return val.isoformat() if isinstance(val, datetime) else datetime.min.isoformat()
+    if key == "Project No":
+        return str(val if val is not None else "").strip()
+    if sql_type == "REAL":
+        return to_number(val)
+    return str(val if val is not None else "")
+
+class RecordDB:
+    """
+    Pengganti ResultStore berbasis SQLite (interface get/put/has/prune sama).
+    Kolom scan_status berisi status setelah cek duplikat.
+    frozen=True: salinan sementara dari freeze(), file dihapus saat close().
+    readonly=True: hanya dibaca (mis. dari proses penulis summary).
+    """
+
+    def __init__(self, folder_path=None, db_path=None, frozen=False, readonly=False):
+        self.folder_path = folder_path
+        if db_path is None:
+            key = hashlib.sha1(os.path.abspath(folder_path or "").encode("utf-8")).hexdigest()[:12]
+            db_path = os.path.join(get_cache_dir(), f"scan_{key}.sqlite")
+        self.db_path = db_path
+        self.frozen = frozen
+        self._lock = threading.RLock()
+        if readonly:
+            uri = Path(os.path.abspath(db_path)).as_uri() + "?mode=ro"
+            self.conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            return
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._init_schema()
+
+    def _init_schema(self):
+        with self._lock:
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != CACHE_VERSION:
+                for table in ("records", "meta", "snapshots"):
+                    self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+            typed = ", ".join(f"{col} {t}" for col, _, t in TYPED_COLUMNS)
+            # snap_hash/snap_fields: nilai snapshot.record_fields, dihitung saat put (diff di SQL)
+            self.conn.execute(f"""CREATE TABLE IF NOT EXISTS records (
+                path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER,
+                {typed}, scan_status TEXT, data TEXT, snap_hash TEXT, snap_fields TEXT)""")
+            for col in ("sort_date", "filename", "pid"):
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{col} ON records({col})")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS snapshots (
+                name TEXT, key TEXT, pid TEXT, status TEXT, hash TEXT, fields TEXT,
+                PRIMARY KEY (name, key))""")
+            self.conn.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+            self.conn.commit()
+
+    # --- Interface ResultStore ---
+
+    def has(self, path, signature):
+        if signature is None: return False
+        with self._lock:
+            row = self.conn.execute("SELECT mtime_ns, size FROM records WHERE path = ?", (path,)).fetchone()
+        return row is not None and tuple(row) == tuple(signature)
+
+    def get(self, path, signature=None):
+        if signature is None:
+            signature = file_signature(path)
+        with self._lock:
+            row = self.conn.execute("SELECT mtime_ns, size, scan_status, data FROM records WHERE path = ?",
+                                    (path,)).fetchone()
+        if row is None or signature is None or (row[0], row[1]) != tuple(signature):
+            return None
+        return json.loads(row[3], object_hook=_decode)
+
+    def put(self, path, data, signature=None):
+        if signature is None:
+            signature = file_signature(path)
+        self.put_many([(path, data, signature)])
+
+    def put_many(self, entries):
+        """entries: iterable (path, data, signature). Satu commit untuk semua."""
+        cols = ", ".join(col for col, _, _ in TYPED_COLUMNS)
+        marks = ", ".join("?" for _ in TYPED_COLUMNS)
+        rows = []
+        for path, data, signature in entries:
+            if signature is None: continue
+            fields_json = json.dumps(record_fields(data), ensure_ascii=False)
+            rows.append([path, signature[0], signature[1]]
+                        + [_typed_value(data, key, t) for _, key, t in TYPED_COLUMNS]
+                        + [data.get("status"), json.dumps(data, default=_encode),
+                           fields_hash(fields_json), fields_json])
+        if not rows: return
+        with self._lock:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO records (path, mtime_ns, size, {cols}, scan_status, data, "
+                f"snap_hash, snap_fields) VALUES (?, ?, ?, {marks}, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+
+    def prune(self, valid_paths):
+        with self._lock:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS valid_paths (path TEXT PRIMARY KEY)")
+            self.conn.execute("DELETE FROM valid_paths")
+            self.conn.executemany("INSERT OR IGNORE INTO valid_paths VALUES (?)", ((p,) for p in valid_paths))
+            self.conn.execute("DELETE FROM records WHERE path NOT IN (SELECT path FROM valid_paths)")
+            self.conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    @property
+    def rates_signature(self):
+        """Tabel kurs yang dipakai untuk record di DB (lihat rates.rates_signature)."""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'rates_signature'").fetchone()
+        return row[0] if row else ""
+
+    @rates_signature.setter
+    def rates_signature(self, value):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('rates_signature', ?)", (value,))
+            self.conn.commit()
+
+    # --- Hasil scan ---
+
+    def mark_duplicates(self, records=None):
+        """
+        Setara scanner.mark_duplicates, dijalankan di SQL. records: hanya
+        grup Project No dari record tersebut (mis. hasil retry beberapa file).
+        """
+        with self._lock:
+            scope = ""
+            if records is not None:
+                pids = {_typed_value(r, "Project No", "TEXT") for r in records}
+                self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS dup_scope (pid TEXT PRIMARY KEY)")
+                self.conn.execute("DELETE FROM dup_scope")
+                self.conn.executemany("INSERT OR IGNORE INTO dup_scope VALUES (?)", ((p,) for p in pids))
+                scope = "AND pid IN (SELECT pid FROM dup_scope)"
+            self.conn.execute(f"""UPDATE records SET scan_status = CASE
+                WHEN status = 'OK' AND pid != '' AND pid IN (
+                    SELECT pid FROM records WHERE status = 'OK' AND pid != '' {scope}
+                    GROUP BY pid HAVING COUNT(*) > 1)
+                THEN 'DUPLIKAT' ELSE status END
+                WHERE 1 {scope}""")
+            self.conn.commit()
+
+    def _where(self, filter_text, partition=None):
+        clauses, params = [], []
+        if filter_text:
+            # Teks dicari apa adanya: '%' dan '_' di-escape agar tidak jadi wildcard
+            text = filter_text.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            like = f"%{text}%"
+            clauses.append("(lower(pid) LIKE ? ESCAPE '\\' OR lower(cust_name) LIKE ? ESCAPE '\\' "
+                           "OR lower(scan_status) LIKE ? ESCAPE '\\')")
+            params += [like, like, like]
+        if partition is not None:
+            clauses.append("part = ?")
+            params.append(partition)
+        return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def count(self, filter_text="", partition=None):
+        where, params = self._where(filter_text, partition)
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM records {where}", params).fetchone()[0]
+
+    def _row_to_record(self, row):
+        item = json.loads(row[1], object_hook=_decode)
+        item["status"] = row[0]
+        return item
+
+    def page(self, offset, limit, order_by=None, descending=False, filter_text=""):
+        """Satu halaman record. order_by = key record (mis. 'Project Value')."""
+        where, params = self._where(filter_text)
+        col = SQL_COLUMN.get(order_by, "sort_date")
+        direction = "DESC" if descending else "ASC"
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT scan_status, data FROM records {where} "
+                f"ORDER BY {col} {direction}, sort_date, path LIMIT ? OFFSET ?",
+                params + [limit, offset]).fetchall()
+        return [self._row_to_record(r) for r in rows]
+
+    def iter_records(self, chunk_size=1000, partition=None):
+        """Semua record (atau satu partisi) urut tanggal, dibaca per chunk (keyset pagination)."""
+        where, params = ("AND part = ?", [partition]) if partition is not None else ("", [])
+        last = (datetime.min.isoformat(), -1)
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT scan_status, data, sort_date, rowid FROM records "
+                    f"WHERE (sort_date, rowid) > (?, ?) {where} ORDER BY sort_date, rowid LIMIT ?",
+                    [last[0], last[1]] + params + [chunk_size]).fetchall()
+            if not rows: return
+            for r in rows:
+                yield self._row_to_record(r)
+            last = (rows[-1][2], rows[-1][3])
+
+    def records(self, partition=None):
+        return RecordSource(self, partition=partition)
+
+    def read_view(self):
+        """
+        Koneksi read-only baru yang menahan satu read transaction: isi DB
+        saat ini tetap terlihat sampai close(), walaupun scan menulis ke DB
+        (WAL). Dipakai tabel preview selama scan ulang.
+        """
+        view = RecordDB(self.folder_path, db_path=self.db_path, readonly=True)
+        view.conn.execute("BEGIN")
+        view.conn.execute("SELECT COUNT(*) FROM records").fetchone() # Mulai read transaction sekarang
+        return view
+
+    # --- Snapshot & diff antar scan (lihat snapshot.StoredSnapshot) ---
+    # Key snapshot = kolom filename. Kolom status snapshot = scan_status
+    # (setelah cek duplikat); snap_fields menyimpan status hasil parse.
+
+    def _fill_scope(self, keys, name):
+        """
+        Tabel sementara snap_scope: keys + record dengan Project No yang sama
+        (sekarang atau di snapshot), karena status DUPLIKAT-nya ikut berubah.
+        """
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS snap_scope (key TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM snap_scope")
+        self.conn.executemany("INSERT OR IGNORE INTO snap_scope VALUES (?)", ((k,) for k in keys))
+        self.conn.execute("""WITH pids AS (
+                SELECT pid FROM records WHERE filename IN (SELECT key FROM snap_scope) AND pid != ''
+                UNION SELECT pid FROM snapshots WHERE name = ? AND key IN (SELECT key FROM snap_scope) AND pid != '')
+            INSERT OR IGNORE INTO snap_scope
+                SELECT filename FROM records WHERE pid IN (SELECT pid FROM pids)
+                UNION SELECT key FROM snapshots WHERE name = ? AND pid IN (SELECT pid FROM pids)""",
+            (name, name))
+
+    def save_snapshot(self, name, keys=None, taken_at=None):
+        """Simpan isi records saat ini sebagai snapshot name (keys: hanya key tersebut, lihat _fill_scope)."""
+        with self._lock:
+            scope = ""
+            if keys is None:
+                self.conn.execute("DELETE FROM snapshots WHERE name = ?", (name,))
+            else:
+                self._fill_scope(keys, name)
+                scope = "WHERE filename IN (SELECT key FROM snap_scope)"
+                self.conn.execute("DELETE FROM snapshots WHERE name = ? AND key IN (SELECT key FROM snap_scope)",
+                                  (name,))
+            self.conn.execute(f"""INSERT OR REPLACE INTO snapshots
+                SELECT ?, filename, pid, scan_status, snap_hash, snap_fields FROM records {scope}""", (name,))
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                              (f"snapshot:{name}", taken_at or datetime.now().isoformat(timespec="seconds")))
+            self.conn.commit()
+
+    def snapshot_taken_at(self, name):
+        """Waktu snapshot name diambil (None jika belum ada)."""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (f"snapshot:{name}",)).fetchone()
+        return row[0] if row else None
+
+    def snapshot_fields(self, key, name=None):
+        """(status, fields JSON) satu key di snapshot name, atau di records saat ini jika name None."""
+        with self._lock:
+            if name is None:
+                return self.conn.execute("SELECT scan_status, snap_fields FROM records WHERE filename = ?",
+                                         (key,)).fetchone()
+            return self.conn.execute("SELECT status, fields FROM snapshots WHERE name = ? AND key = ?",
+                                     (name, key)).fetchone()
+
+    def snapshot_changes(self, name, keys=None):
+        """
+        Bandingkan records saat ini dengan snapshot name di SQL (name None =
+        semua baru). Return (added, removed, modified) dengan modified = list
+        (key, status lama, fields lama, status baru, fields baru) hanya untuk
+        baris yang hash atau statusnya berbeda.
+        """
+        with self._lock:
+            scope_r = scope_s = ""
+            if keys is not None:
+                self._fill_scope(keys, name)
+                scope_r = "AND r.filename IN (SELECT key FROM snap_scope)"
+                scope_s = "AND s.key IN (SELECT key FROM snap_scope)"
+            added = [r[0] for r in self.conn.execute(
+                f"""SELECT r.filename FROM records r WHERE NOT EXISTS (
+                    SELECT 1 FROM snapshots s WHERE s.name = ? AND s.key = r.filename) {scope_r}""", (name,))]
+            removed = [r[0] for r in self.conn.execute(
+                f"""SELECT s.key FROM snapshots s WHERE s.name = ? AND NOT EXISTS (
+                    SELECT 1 FROM records r WHERE r.filename = s.key) {scope_s}""", (name,))]
+            modified = self.conn.execute(
+                f"""SELECT r.filename, s.status, s.fields, r.scan_status, r.snap_fields
+                    FROM records r JOIN snapshots s ON s.name = ? AND s.key = r.filename
+                    WHERE (s.hash != r.snap_hash OR s.status != r.scan_status) {scope_r}""", (name,)).fetchall()
+        return added, removed, modified
+
+    def load_snapshot_file(self, path, name):
+        """
+        Salin snapshot dari file SQLite (save_snapshot_file) ke snapshot name.
+        Return waktu snapshot, atau None jika file tidak ada / rusak / daftar
+        field-nya berbeda.
+        """
+        if not os.path.exists(path): return None
+        with self._lock:
+            self.conn.commit()
+            self.conn.execute("ATTACH DATABASE ? AS snapfile", (path,))
+            try:
+                meta = dict(self.conn.execute("SELECT key, value FROM snapfile.meta"))
+                if json.loads(meta.get("fields", "null")) != FIELD_NAMES: return None
+                self.conn.execute("DELETE FROM snapshots WHERE name = ?", (name,))
+                self.conn.execute("""INSERT OR REPLACE INTO snapshots
+                    SELECT ?, key, pid, status, hash, fields FROM snapfile.snapshots""", (name,))
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                  (f"snapshot:{name}", meta.get("taken_at")))
+                self.conn.commit()
+                return meta.get("taken_at")
+            except (sqlite3.DatabaseError, ValueError):
+                self.conn.rollback()
+                return None
+            finally:
+                self.conn.execute("DETACH DATABASE snapfile")
+
+    def save_snapshot_file(self, path, taken_at=None):
+        """Tulis isi records saat ini sebagai snapshot ke file SQLite terpisah (ditulis atomik)."""
+        tmp = path + ".tmp"
+        if os.path.exists(tmp): os.remove(tmp)
+        with self._lock:
+            self.conn.commit()
+            self.conn.execute("ATTACH DATABASE ? AS snapfile", (tmp,))
+            try:
+                self.conn.execute("""CREATE TABLE snapfile.snapshots (
+                    key TEXT PRIMARY KEY, pid TEXT, status TEXT, hash TEXT, fields TEXT)""")
+                self.conn.execute("CREATE TABLE snapfile.meta (key TEXT PRIMARY KEY, value TEXT)")
+                self.conn.execute("""INSERT OR REPLACE INTO snapfile.snapshots
+                    SELECT filename, pid, scan_status, snap_hash, snap_fields FROM records""")
+                self.conn.executemany("INSERT INTO snapfile.meta VALUES (?, ?)", [
+                    ("fields", json.dumps(FIELD_NAMES)),
+                    ("taken_at", taken_at or datetime.now().isoformat(timespec="seconds"))])
+                self.conn.commit()
+            finally:
+                self.conn.execute("DETACH DATABASE snapfile")
+        os.replace(tmp, path)
+
+    # --- Salinan beku & partisi (generator) ---
+
+    def freeze(self):
+        """
+        Salinan isi DB saat ini ke file sementara (SQLite backup API, satu
+        kali baca yang konsisten). Scan ulang / retry yang menulis ke DB ini
+        tidak mengubah salinan, sehingga semua lintasan generator melihat
+        data yang sama. Panggil close() pada salinan untuk menghapusnya.
+        """
+        fd, path = tempfile.mkstemp(prefix="frozen_", suffix=".sqlite", dir=get_cache_dir())
+        os.close(fd)
+        dest = sqlite3.connect(path)
+        try:
+            with self._lock:
+                self.conn.backup(dest)
+        finally:
+            dest.close()
+        return RecordDB(self.folder_path, db_path=path, frozen=True)
+
+    def assign_partitions(self, partition_of):
+        """
+        Isi kolom part dengan partition_of(record) untuk setiap baris (satu
+        lintasan) agar tiap partisi bisa di-stream dengan WHERE part = ?.
+        Return daftar nilai partisi terurut.
+        """
+        def part(status, data):
+            return partition_of(self._row_to_record((status, data)))
+        with self._lock:
+            columns = [r[1] for r in self.conn.execute("PRAGMA table_info(records)")]
+            if "part" not in columns:
+                self.conn.execute("ALTER TABLE records ADD COLUMN part TEXT")
+            self.conn.create_function("partition_of", 2, part)
+            self.conn.execute("UPDATE records SET part = partition_of(scan_status, data)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_part ON records(part, sort_date)")
+            self.conn.commit()
+            values = [r[0] for r in self.conn.execute("SELECT DISTINCT part FROM records")]
+        return sorted(values)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+        if self.frozen:
+            for suffix in ("", "-wal", "-shm"):
+                try: os.remove(self.db_path + suffix)
+                except OSError: pass
+
+def open_record_source(db_path, chunk_size=1000, partition=None):
+    """Buka ulang RecordSource (read-only) dari path DB, mis. di proses lain."""
+    return RecordSource(RecordDB(db_path=db_path, readonly=True), chunk_size, partition)
+
+class RecordSource:
+    """
+    Tampilan read-only hasil scan di RecordDB: bisa di-len() dan di-iterasi
+    berulang kali (streaming per chunk). Dipakai UI & GeneratorWorker
+    sebagai pengganti list record. partition: hanya record dengan nilai
+    kolom part tersebut (lihat RecordDB.assign_partitions).
+    Bisa di-pickle (dibuka ulang dari path DB di proses tujuan).
+    """
+
+    def __init__(self, db, chunk_size=1000, partition=None):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.partition = partition
+        self._len = db.count(partition=partition)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return self.db.iter_records(self.chunk_size, self.partition)
+
+    def __reduce__(self):
+        return open_record_source, (self.db.db_path, self.chunk_size, self.partition)
+
+    def freeze(self):
+        """RecordSource atas salinan beku DB (lihat RecordDB.freeze)."""
+        return self.db.freeze().records(self.partition)
+
+class PageCache:
+    """Cache halaman record (LRU) dengan batas jumlah halaman."""
+
+    def __init__(self, max_pages):
+        self.max_pages = max(1, max_pages)
+        self._pages = OrderedDict()
+
+    def get(self, key):
+        page = self._pages.get(key)
+        if page is not None: self._pages.move_to_end(key)
+        return page
+
+    def put(self, key, page):
+        self._pages[key] = page
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+
+    def items(self):
+        return list(self._pages.items())
+
+    def clear(self):
+        self._pages.clear()
@@ -0,0 +1,442 @@
+import os
+import json
+import hashlib
+import openpyxl
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from openpyxl.cell import WriteOnlyCell
+
+from helpers import sanitize_filename, compute_derived_columns, to_number, iter_chunks
+from store import RecordSource
+
+# ==========================================
+# 1. PENULISAN SHEET SUMMARY
+# ==========================================
+
+HEADERS = [
+    "File name",      # Col 1 (A)
+    "No",             # Col 2 (B)
+    "Project no.",    # Col 3 (C)
+    "Busunit",        # Col 4 (D)
+    "Proj date",      # Col 5 (E)
+    "Cust name",      # Col 6 (F)
+    "Ccy",            # Col 7 (G)
+    "Project value",  # Col 8 (H)
+    "Kurs",           # Col 9 (I)
+    "Proj IDR",       # Col 10 (J)
+    "BARANG&JASA",    # Col 11 (K)
+    "Penalty",        # Col 12 (L)
+    "Warranty",       # Col 13 (M)
+    "Freight",        # Col 14 (N)
+    "Cost (estd.)",   # Col 15 (O)
+    "CM booked",      # Col 16 (P)
+    "CR booked",      # Col 17 (Q)
+    "CM IDR",         # Col 18 (R)
+    "CM %",           # Col 19 (S)
+    "COST %",         # Col 20 (T)
+    "Ket."            # Col 21 (U)
+]
+
+SUM_COLS = [8, 10, 11, 12, 13, 14, 15, 16, 18]
+HEADER_ROW_IDX = 3
+
+def _summary_rows(records, use_formulas):
+    """
+    Generator (row_data, status) per record. Record dibaca per chunk,
+    kolom hitungan (mode nilai) dihitung per chunk.
+    """
+    idx = 0
+    for chunk in iter_chunks(records, 1000):
+        derived = None if use_formulas else compute_derived_columns(chunk)
+        for i, item in enumerate(chunk):
+            idx += 1
+            r = HEADER_ROW_IDX + idx # Row index di Excel
+            
+            # --- PENGAMBILAN DATA (SAFE ACCESS) ---
+            # Menggunakan .get() karena file ERROR tidak punya key lengkap
+            val_project = item.get("Project Value", 0)
+            val_ccy = item.get("Currency", "IDR")
+            
+            raw_kurs = item.get("Kurs", 1.0)
+            val_kurs = 1.0 if val_ccy == "IDR" else (raw_kurs if raw_kurs else 1.0)
+            
+            val_cm = item.get("CM Booked", 0)
+            
+            # --- FIX DATE ---
+            val_date = item.get("_sort_date", datetime.min)
+            if val_date == datetime.min:
+                val_date = item.get("Proj Date", "")
+
+            f_cr_booked = item.get("CR Booked", 0)
+            
+            if derived is None:
+                # --- RUMUS EXCEL ---
+                f_proj_idr = f"=H{r}*I{r}" 
+                val_cost = f"=SUM(K{r}:N{r})" 
+                f_cm_idr = f"=J{r}-O{r}" 
+                f_cm_pct = f"=IF(J{r}=0, 0, R{r}/J{r})"
+                f_cost_pct = f"=IF(J{r}=0, 0, O{r}/J{r})"
+            else:
+                # --- NILAI HASIL HITUNG (tanpa rumus) ---
+                val_kurs = derived["Kurs"][i]
+                f_proj_idr = derived["Proj IDR"][i]
+                val_cost = derived["Cost"][i]
+                f_cm_idr = derived["CM IDR"][i]
+                f_cm_pct = derived["CM %"][i]
+                f_cost_pct = derived["Cost %"][i]
+            
+            # --- STATUS & KETERANGAN ---
+            status = item.get("status", "UNKNOWN")
+            status_ket = ""
+            if status == "DUPLIKAT":
+                status_ket = "Duplikat Input"
+            elif status != "OK":
+                # Tampilkan pesan error di kolom Ket
+                status_ket = item.get("msg", status)
+
+            # Mapping Data
+            row_data = [
+                item.get("filename", "Unknown"), # 1. Nama File
+                idx,                             # 2. No
+                item.get("Project No", "-"),     # 3. Project No
+                "",                              # 4. Busunit
+                val_date,                        # 5. Proj Date
+                item.get("Cust Name", "-"),      # 6. Cust Name
+                val_ccy,                         # 7. Ccy
+                val_project,                     # 8. Project Value
+                val_kurs,                        # 9. Kurs
+                f_proj_idr,                      # 10. Proj IDR
+                item.get("Sub Total", 0),        # 11. B&J
+                item.get("Penalty", 0),          # 12. Penalty
+                item.get("Warranty", 0),         # 13. Warranty
+                0,                               # 14. Freight
+                val_cost,                        # 15. Cost Estd
+                val_cm,                          # 16. CM Booked
+                f_cr_booked,                     # 17. CR Booked
+                f_cm_idr,                        # 18. CM IDR
+                f_cm_pct,                        # 19. CM %
+                f_cost_pct,                      # 20. Cost %
+                status_ket                       # 21. Ket (Isi Pesan Error)
+            ]
+            yield row_data, status
+
+def write_summary_sheet(ws, title, records, use_formulas=True):
+    """
+    Mengisi satu worksheet summary (judul, header, data, Grand Total).
+    ws adalah worksheet write-only (openpyxl Workbook(write_only=True)):
+    baris langsung di-stream ke file sehingga memori tidak bertambah
+    seiring jumlah record. Karena lebar kolom harus diset sebelum baris
+    pertama, data dibaca dua kali (ukur lebar, lalu tulis).
+    """
+    black_side = openpyxl.styles.Side(style='thin', color="000000")
+    border_black = openpyxl.styles.Border(left=black_side, right=black_side, top=black_side, bottom=black_side)
+    border_black_row = openpyxl.styles.Border(left=black_side, right=black_side)
+    
+    duplicate_fill = openpyxl.styles.PatternFill("solid", fgColor="FFFF00") # Kuning
+    error_fill = openpyxl.styles.PatternFill("solid", fgColor="FFCCCC") # Merah Muda (Untuk Error)
+
+    # --- PASS 1: LEBAR KOLOM & TOTAL ---
+    dims = {}
+    def measure(values):
+        for c, val in enumerate(values, 1):
+            if val: dims[c] = max(dims.get(c, 0), len(str(val)))
+    
+    measure([None, title])
+    measure(HEADERS)
+    n_rows = 0
+    col_totals = {c: 0 for c in SUM_COLS}
+    for row_data, _ in _summary_rows(records, use_formulas):
+        measure(row_data)
+        n_rows += 1
+        if not use_formulas:
+            for c in SUM_COLS: col_totals[c] += to_number(row_data[c - 1])
+    
+    start_data_row = HEADER_ROW_IDX + 1 
+    end_data_row = start_data_row + n_rows - 1
+    total_row = []
+    for c in range(1, len(HEADERS) + 1):
+        val = None
+        if c == 7: val = "GRAND TOTAL"
+        elif c in SUM_COLS:
+            if use_formulas:
+                col_letter = openpyxl.utils.get_column_letter(c)
+                val = f"=SUM({col_letter}{start_data_row}:{col_letter}{end_data_row})"
+            else:
+                val = col_totals[c]
+        total_row.append(val)
+    if n_rows: measure(total_row)
+    
+    for c, value in dims.items():
+        ws.column_dimensions[openpyxl.utils.get_column_letter(c)].width = value + 2
+
+    def make_cell(value, font=None, fill=None, border=None, number_format=None, alignment=None):
+        cell = WriteOnlyCell(ws, value=value)
+        if font: cell.font = font
+        if fill: cell.fill = fill
+        if border: cell.border = border
+        if number_format: cell.number_format = number_format
+        if alignment: cell.alignment = alignment
+        return cell
+
+    # --- A. SETUP JUDUL (Row 1) ---
+    ws.append([None, make_cell(title, font=openpyxl.styles.Font(size=14, bold=True, name='Calibri'))])
+    
+    # --- B. SETUP HEADER (Row 3) ---
+    header_font = openpyxl.styles.Font(bold=True, name='Calibri', size=11)
+    header_fill = openpyxl.styles.PatternFill("solid", fgColor="00FFFF") 
+    header_align = openpyxl.styles.Alignment(horizontal='center', vertical='center')
+    ws.append([]) # Row 2 Kosong
+    ws.append([make_cell(h, header_font, header_fill, border_black, alignment=header_align) for h in HEADERS]) # Row 3 Header
+
+    # --- C. ISI DATA (Mulai Row 4) ---
+    for row_data, status in _summary_rows(records, use_formulas):
+        # Terapkan Warna (Kuning utk Duplikat, Merah utk Error)
+        fill_color = duplicate_fill if status == "DUPLIKAT" else (error_fill if status != "OK" else None)
+        
+        cells = []
+        for c, val in enumerate(row_data, 1):
+            fmt = None
+            if c == 5: fmt = 'd-mmm-yy'
+            if c in SUM_COLS: fmt = '#,##0'
+            if c == 9: fmt = '#,##0.00'
+            if c in [17, 19, 20]: fmt = '0.00%'
+            cells.append(make_cell(val, fill=fill_color, border=border_black_row, number_format=fmt))
+        ws.append(cells)
+
+    # --- D. TAMBAHKAN BARIS TOTAL (SUMMARY) ---
+    if n_rows:
+        total_font = openpyxl.styles.Font(bold=True, name='Calibri', size=11)
+        total_border = openpyxl.styles.Border(top=black_side, bottom=openpyxl.styles.Side(style='medium', color="000000"))
+        ws.append([make_cell(val, font=total_font, border=total_border,
+                             number_format='#,##0' if c in SUM_COLS else None)
+                   for c, val in enumerate(total_row, 1)])
+
+def build_summary_workbook(path, title, records, use_formulas=True, changes=None):
+    """Membuat satu file summary. Fungsi top-level agar bisa dijalankan di proses lain."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_title(title))
+    write_summary_sheet(ws, title, records, use_formulas)
+    if changes is not None:
+        write_changes_sheet(wb.create_sheet("PERUBAHAN"), *changes)
+    wb.save(path)
+    return path
+
+def sheet_title(text):
+    """Judul sheet Excel: tanpa karakter ilegal dan maksimal 31 karakter."""
+    clean = sanitize_filename(text).replace("[", "").replace("]", "")
+    return clean[:31]
+
+# ==========================================
+# 2. PARTISI (PER TAHUN / PER KEY)
+# ==========================================
+
+NO_DATE_PARTITION = "Tanpa Tanggal" # Record ERROR / tanpa tanggal proyek
+PARTITION_FILE_PREFIX = "PCM PARTISI " # Beda dari "PCM [TAHUN] SUMMARY.xlsx" mode satu sheet
+
+def partition_value(item, key):
+    """
+    Nilai partisi sebuah record. key 'year' memakai tahun proyek; record
+    tanpa tanggal valid masuk partisi sendiri (bukan tahun berjalan).
+    """
+    if key == "year":
+        date = item.get("_sort_date")
+        if isinstance(date, datetime) and date > datetime.min:
+            return str(date.year)
+        return NO_DATE_PARTITION
+    return sanitize_filename(item.get(key))
+
+def partition_records(records, key):
+    """
+    Kelompokkan record per nilai partisi (urutan record dipertahankan).
+    RecordSource: nilai partisi dihitung sekali ke kolom SQLite, lalu tiap
+    partisi menjadi RecordSource yang di-stream (WHERE part = ?) sehingga
+    record tidak dimuat ke memori. Sebaiknya dipakai pada salinan beku
+    (RecordDB.freeze) karena DB ditulisi. List: dikelompokkan di memori.
+    """
+    if isinstance(records, RecordSource):
+        db = records.db
+        names = db.assign_partitions(lambda item: partition_value(item, key))
+        return {name: db.records(partition=name) for name in names}
+    parts = {}
+    for item in records:
+        parts.setdefault(partition_value(item, key), []).append(item)
+    return dict(sorted(parts.items()))
+
+def partition_hash(records, use_formulas=True):
+    """Hash isi partisi; partisi dengan hash sama tidak perlu ditulis ulang."""
+    h = hashlib.sha1(str(use_formulas).encode())
+    for item in records:
+        row = sorted((k, str(v)) for k, v in item.items())
+        h.update(repr(row).encode("utf-8"))
+    return h.hexdigest()
+
+def partition_totals(records):
+    """Total per partisi untuk sheet rollup (record dibaca per chunk)."""
+    totals = {"Files": 0, "Project value": 0, "Proj IDR": 0, "Cost (estd.)": 0, "CM booked": 0, "CM IDR": 0}
+    for chunk in iter_chunks(records, 1000):
+        derived = compute_derived_columns(chunk)
+        totals["Files"] += len(chunk)
+        totals["Project value"] = sum((to_number(r.get("Project Value", 0)) for r in chunk), totals["Project value"])
+        totals["Proj IDR"] = sum(derived["Proj IDR"], totals["Proj IDR"])
+        totals["Cost (estd.)"] = sum(derived["Cost"], totals["Cost (estd.)"])
+        totals["CM booked"] = sum((to_number(r.get("CM Booked", 0)) for r in chunk), totals["CM booked"])
+        totals["CM IDR"] = sum(derived["CM IDR"], totals["CM IDR"])
+    return totals
+
+def write_rollup_sheet(ws, title, totals_by_partition, key):
+    """Sheet ringkas (write-only): satu baris per partisi + total keseluruhan."""
+    bold = openpyxl.styles.Font(bold=True, name='Calibri', size=11)
+    header_fill = openpyxl.styles.PatternFill("solid", fgColor="00FFFF")
+    
+    def make_cell(value, font=None, fill=None, number_format=None):
+        cell = WriteOnlyCell(ws, value=value)
+        if font: cell.font = font
+        if fill: cell.fill = fill
+        if number_format: cell.number_format = number_format
+        return cell
+    
+    columns = ["Files", "Project value", "Proj IDR", "Cost (estd.)", "CM booked", "CM IDR"]
+    headers = ["Tahun" if key == "year" else key] + columns + ["CM %"]
+    
+    ws.column_dimensions['A'].width = 16
+    for col in "BCDEFGH":
+        ws.column_dimensions[col].width = 18
+    
+    def data_row(values, font=None):
+        # Kolom C-G angka (#,##0), kolom H persentase
+        return [make_cell(v, font, number_format='#,##0' if 2 <= i <= 6 else ('0.00%' if i == 7 else None))
+                for i, v in enumerate(values)]
+    
+    ws.append([None, make_cell(title, font=openpyxl.styles.Font(size=14, bold=True, name='Calibri'))])
+    ws.append([])
+    ws.append([make_cell(h, bold, header_fill) for h in headers])
+    
+    grand = {c: 0 for c in columns}
+    for name, totals in totals_by_partition.items():
+        for c in columns: grand[c] += totals[c]
+        pct = totals["CM IDR"] / totals["Proj IDR"] if totals["Proj IDR"] else 0
+        ws.append(data_row([name] + [totals[c] for c in columns] + [pct]))
+    
+    pct = grand["CM IDR"] / grand["Proj IDR"] if grand["Proj IDR"] else 0
+    ws.append(data_row(["GRAND TOTAL"] + [grand[c] for c in columns] + [pct], bold))
+
+def write_changes_sheet(ws, since, rows):
+    """
+    Sheet perubahan sejak generate terakhir (write-only).
+    since: waktu generate sebelumnya (None = belum pernah), rows: snapshot.change_rows().
+    """
+    bold = openpyxl.styles.Font(bold=True, name='Calibri', size=11)
+    header_fill = openpyxl.styles.PatternFill("solid", fgColor="00FFFF")
+    kind_fill = {"BARU": openpyxl.styles.PatternFill("solid", fgColor="C8E6C9"),
+                 "DIHAPUS": openpyxl.styles.PatternFill("solid", fgColor="FFCDD2"),
+                 "BERUBAH": openpyxl.styles.PatternFill("solid", fgColor="FFF9C4")}
+    
+    def make_cell(value, font=None, fill=None, number_format=None):
+        cell = WriteOnlyCell(ws, value=value)
+        if font: cell.font = font
+        if fill: cell.fill = fill
+        if number_format: cell.number_format = number_format
+        return cell
+    
+    for col, width in zip("ABCDEF", (12, 40, 18, 16, 20, 20)):
+        ws.column_dimensions[col].width = width
+    
+    title = f"PERUBAHAN SEJAK GENERATE {since}" if since else "PERUBAHAN SEJAK GENERATE TERAKHIR"
+    ws.append([make_cell(title, font=openpyxl.styles.Font(size=14, bold=True, name='Calibri'))])
+    ws.append([])
+    if since is None:
+        ws.append(["Belum ada data generate sebelumnya di folder output ini."])
+        return
+    ws.append([make_cell(h, bold, header_fill) for h in ("Jenis", "File", "Project No", "Field", "Lama", "Baru")])
+    count = 0
+    for kind, key, pid, field, old, new in rows:
+        fill = kind_fill.get(kind)
+        num = '#,##0.##' if isinstance(new, float) else None
+        ws.append([make_cell(kind, fill=fill), make_cell(key), make_cell(pid), make_cell(field),
+                   make_cell(old, number_format=num), make_cell(new, number_format=num)])
+        count += 1
+    if count == 0:
+        ws.append(["Tidak ada perubahan."])
+
+def load_manifest(output_folder):
+    try:
+        with open(os.path.join(output_folder, "summary_manifest.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except:
+        return {}
+
+def save_manifest(output_folder, manifest):
+    with open(os.path.join(output_folder, "summary_manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+
+def write_partitioned_sheets(output_folder, records, key, use_formulas=True, changes=None):
+    """Satu workbook, satu sheet per partisi + sheet ROLLUP di depan."""
+    parts = partition_records(records, key)
+    wb = openpyxl.Workbook(write_only=True)
+    write_rollup_sheet(wb.create_sheet("ROLLUP"), "PCM SUMMARY ROLLUP",
+                       {n: partition_totals(r) for n, r in parts.items()}, key)
+    for name, part in parts.items():
+        ws = wb.create_sheet(sheet_title(f"PCM {name} SUMMARY"))
+        write_summary_sheet(ws, f"PCM {name} SUMMARY", part, use_formulas)
+    if changes is not None:
+        write_changes_sheet(wb.create_sheet("PERUBAHAN"), *changes)
+    
+    path = os.path.join(output_folder, "PCM SUMMARY.xlsx")
+    wb.save(path)
+    return path
+
+def write_partitioned_workbooks(output_folder, records, key, use_formulas=True, max_workers=None, log=None,
+                                changes=None):
+    """
+    Satu file summary per partisi, ditulis paralel di beberapa proses.
+    Partisi yang isinya tidak berubah sejak generate terakhir (cek hash di
+    summary_manifest.json) dan file-nya masih ada tidak ditulis ulang.
+    File partisi dari generate sebelumnya yang partisinya sudah tidak ada
+    dihapus. Return path file rollup (sheet PERUBAHAN, jika diminta, ada di file ini).
+    """
+    parts = partition_records(records, key)
+    manifest = load_manifest(output_folder)
+    new_manifest = {}
+    jobs = {}
+    
+    for name, part in parts.items():
+        filename = f"{PARTITION_FILE_PREFIX}{name} SUMMARY.xlsx"
+        path = os.path.join(output_folder, filename)
+        digest = partition_hash(part, use_formulas)
+        new_manifest[f"{key}:{name}"] = {"hash": digest, "file": filename}
+        old = manifest.get(f"{key}:{name}")
+        if old and old.get("hash") == digest and os.path.exists(path):
+            continue
+        jobs[name] = (path, f"PCM {name} SUMMARY", part)
+    
+    if log: log(f"📊 Menulis {len(jobs)} dari {len(parts)} partisi (sisanya tidak berubah)...")
+    if len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(build_summary_workbook, path, title, part, use_formulas)
+                       for path, title, part in jobs.values()]
+            for f in futures: f.result()
+    else:
+        for path, title, part in jobs.values():
+            build_summary_workbook(path, title, part, use_formulas)
+    
+    # Rollup selalu ditulis ulang (ringan)
+    wb = openpyxl.Workbook(write_only=True)
+    write_rollup_sheet(wb.create_sheet("ROLLUP"), "PCM SUMMARY ROLLUP",
+                       {n: partition_totals(r) for n, r in parts.items()}, key)
+    if changes is not None:
+        write_changes_sheet(wb.create_sheet("PERUBAHAN"), *changes)
+    rollup_path = os.path.join(output_folder, "PCM SUMMARY ROLLUP.xlsx")
+    wb.save(rollup_path)
+    
+    # Hapus file partisi lama yang tidak lagi dihasilkan (hanya pola nama file partisi)
+    current = {entry["file"] for entry in new_manifest.values()}
+    for entry in manifest.values():
+        filename = entry.get("file") if isinstance(entry, dict) else None
+        if not filename or filename in current or not filename.startswith(PARTITION_FILE_PREFIX):
+            continue
+        try: os.remove(os.path.join(output_folder, os.path.basename(filename)))
+        except OSError: pass
+    
+    save_manifest(output_folder, new_manifest)
+    return rollup_path
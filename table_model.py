@@ -0,0 +1,182 @@
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PySide6.QtGui import QColor
+
+from store import PageCache
+from snapshot import record_key
+
+# ==========================================
+# MODEL TABEL PREVIEW
+# ==========================================
+# Sorting & filter dijalankan di atas kolom bertipe (angka, tanggal) di
+# RecordDB, bukan di atas teks tampilan "1.234.567".
+
+# (judul kolom, key record, jenis)
+COLUMNS = [
+    ("Nama File Asli", "filename", "text"),
+    ("Status", "status", "text"),
+    ("Project No", "Project No", "text"),
+    ("Customer", "Cust Name", "text"),
+    ("Proj Date", "Proj Date", "date"),
+    ("Ccy", "Currency", "text"),
+    ("Kurs", "Kurs", "num"),
+    ("Project Value", "Project Value", "num"),
+    ("Sub Total", "Sub Total", "num"),
+    ("Penalty", "Penalty", "num"),
+    ("Warranty", "Warranty", "num"),
+    ("Total Cost", "Total Cost", "num"),
+    ("CM Booked", "CM Booked", "num"),
+    ("CR Booked", "CR Booked", "num"),
+]
+
+FILTER_FIELDS = {"Project No", "Cust Name", "status"} # Kolom yang dicari oleh set_filter (RecordDB._where)
+
+def format_num(val):
+    if isinstance(val, (int, float)):
+        return f"{val:,.0f}".replace(",", ".")
+    return str(val)
+
+def display_status(status):
+    return "DUPLIKAT (Diproses)" if status == "DUPLIKAT" else status
+
+class RecordTableModel(QAbstractTableModel):
+    """
+    Model tabel yang membaca record per halaman dari RecordDB (SQLite).
+    Hanya halaman yang terlihat yang disimpan di memori (PageCache), jadi
+    pemakaian memori tidak bergantung pada jumlah file di folder.
+    Sort & filter dijalankan oleh SQLite pada kolom bertipe.
+    """
+    PAGE_SIZE = 200
+    APPROX_RECORD_BYTES = 2048
+
+    def __init__(self, parent=None, memory_cap_mb=32):
+        super().__init__(parent)
+        self.db = None
+        self._live_db = None # DB asli selama tabel membaca dari read_view() (lihat hold)
+        self._count = 0
+        self._filter = ""
+        self._sort = None # (kolom, order)
+        self.set_memory_cap(memory_cap_mb)
+
+    def set_memory_cap(self, memory_cap_mb):
+        max_pages = int(memory_cap_mb * 1024 * 1024 / (self.PAGE_SIZE * self.APPROX_RECORD_BYTES))
+        self._pages = PageCache(max_pages)
+
+    # --- DATA ---
+
+    def set_source(self, db):
+        """db: RecordDB hasil scan (atau None untuk mengosongkan tabel)."""
+        self.beginResetModel()
+        self._release()
+        self.db = db
+        self._reload()
+        self.endResetModel()
+
+    def apply_diff(self, db, diff):
+        """
+        Perbarui tabel setelah scan ulang berdasarkan SnapshotDiff.
+        Jika hanya nilai yang berubah (urutan & hasil filter tetap), hanya
+        baris yang berubah yang di-refresh; seleksi & posisi scroll tetap.
+        """
+        self._release()
+        if db is not self.db or diff.added or diff.removed:
+            self.set_source(db)
+            return
+        if not diff.modified: return
+        
+        changed = diff.changed_fields()
+        order_key = COLUMNS[self._sort[0]][1] if self._sort is not None else "Proj Date"
+        if order_key in changed or "Proj Date" in changed or (self._filter and changed & FILTER_FIELDS):
+            self.set_source(db) # Urutan baris / jumlah hasil filter bisa berubah
+            return
+        
+        keys = set(diff.modified)
+        rows = [page_no * self.PAGE_SIZE + i for page_no, page in self._pages.items()
+                for i, item in enumerate(page) if record_key(item) in keys]
+        self._pages.clear()
+        for row in rows:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(COLUMNS) - 1))
+
+    def hold(self):
+        """
+        Dipanggil saat scan ulang mulai: tabel membaca dari read_view() DB
+        (isi DB saat ini) sehingga jumlah baris & halaman tetap konsisten
+        selama scan menulis ke DB. Dilepas oleh apply_diff / set_source.
+        """
+        if self.db is None or self._live_db is not None: return
+        self._live_db = self.db
+        self.db = self.db.read_view() # Isi sama -> halaman di cache tetap valid
+
+    def _release(self):
+        if self._live_db is None: return
+        self.db.close()
+        self.db, self._live_db = self._live_db, None
+
+    def _reload(self):
+        self._pages.clear()
+        self._count = self.db.count(self._filter) if self.db is not None else 0
+
+    def record_at(self, row):
+        if self.db is None or not (0 <= row < self._count): return None
+        page_no = row // self.PAGE_SIZE
+        page = self._pages.get(page_no)
+        if page is None:
+            order_by, descending = None, False
+            if self._sort is not None:
+                order_by = COLUMNS[self._sort[0]][1]
+                descending = self._sort[1] == Qt.DescendingOrder
+            page = self.db.page(page_no * self.PAGE_SIZE, self.PAGE_SIZE, order_by, descending, self._filter)
+            self._pages.put(page_no, page)
+        idx = row % self.PAGE_SIZE
+        return page[idx] if idx < len(page) else None
+
+    # --- FILTER & SORT ---
+
+    def set_filter(self, text):
+        self.beginResetModel()
+        self._filter = text.strip().lower()
+        self._reload()
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if not (0 <= column < len(COLUMNS)): return
+        self.layoutAboutToBeChanged.emit()
+        self._sort = (column, order)
+        self._pages.clear()
+        self.layoutChanged.emit()
+
+    # --- QAbstractTableModel ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section][0]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid(): return None
+        item = self.record_at(index.row())
+        if item is None: return None
+        _, key, kind = COLUMNS[index.column()]
+        status = item.get("status", "")
+
+        if role == Qt.DisplayRole:
+            if key == "status": return display_status(status)
+            if kind == "num": return format_num(item.get(key, 0))
+            return str(item.get(key, "-"))
+        if role == Qt.ToolTipRole:
+            return item.get("msg") or None # Semua pelanggaran aturan validasi
+        if role == Qt.TextAlignmentRole and kind == "num":
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role == Qt.BackgroundRole:
+            if status == "DUPLIKAT": return QColor("#FFEB3B")
+            if status == "TERKUNCI": return QColor("#FFE0B2") # Menunggu retry otomatis
+            if status != "OK": return QColor("#FFCDD2")
+            return QColor(Qt.white)
+        if role == Qt.ForegroundRole:
+            return QColor(Qt.red) if status not in ("OK", "DUPLIKAT") else QColor(Qt.black)
+        return None
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# Modul aplikasi ada di root repository (tanpa package)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import build_corpus
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "perf: uji latensi parser per file (hanya jika PCM_PERF=1)")
+
+def pytest_collection_modifyitems(config, items):
+    # Uji latensi bergantung pada kecepatan mesin -> hanya dijalankan jika diminta
+    if os.environ.get("PCM_PERF") == "1": return
+    skip = pytest.mark.skip(reason="Uji latensi: jalankan dengan PCM_PERF=1")
+    for item in items:
+        if "perf" in item.keywords: item.add_marker(skip)
+
+@pytest.fixture(autouse=True)
+def _isolated_cache_dir(tmp_path, monkeypatch):
+    """Folder cache aplikasi (slow_files.json, salinan beku DB) di tmp_path, bukan milik user."""
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path))
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory):
+    """Korpus fixture .xlsx dan .xls (xlwt atau tests/fixtures), dibuat sekali per sesi."""
+    return build_corpus(str(tmp_path_factory.mktemp("corpus")))
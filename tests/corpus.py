@@ -0,0 +1,144 @@
+import os
+import shutil
+from datetime import datetime
+
+import openpyxl
+
+try:
+    import xlwt # Hanya untuk membuat fixture .xls (xlrd tidak bisa menulis)
+except ImportError:
+    xlwt = None
+
+from helpers import addr_to_index
+
+# ==========================================
+# KORPUS FIXTURE PARSER
+# ==========================================
+# Setiap kasus: sel per alamat ("B3"), baris biaya di kolom A/E mulai baris
+# ke-11, dan record yang diharapkan (golden). File .xlsx dan .xls dibuat dari
+# definisi yang sama sehingga hasil semua engine bisa dibandingkan.
+# xlwt biasanya tidak terpasang, jadi file .xls hasil write_xls disimpan di
+# tests/fixtures (buat ulang dengan "python tests/corpus.py" setelah CASES
+# diubah) dan disalin dari sana jika xlwt tidak ada.
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+DATE = datetime(2024, 3, 15)
+
+def _cells(**overrides):
+    cells = {
+        "B3": DATE,
+        "B4": 1,
+        "A5": "Sales price in IDR excl. VAT",
+        "B5": 1000000,
+        "J3": "Customer", "K3": "PT Maju",
+        "J4": "Project No", "K4": "PRJ-001",
+    }
+    cells.update(overrides)
+    return {k: v for k, v in cells.items() if v is not None}
+
+ROWS = [("SUB TOTAL", 600000), ("PENALTY", 10000), ("WARRANTY", 5000),
+        ("TOTAL COST", 615000), ("CM BOOKED", 385000), ("CR BOOKED", 0.385)]
+
+def _expected(**overrides):
+    exp = {
+        "status": "OK", "msg": "",
+        "Project No": "PRJ-001", "Cust Name": "PT Maju", "Proj Date": "15-Mar-24",
+        "Currency": "IDR", "Kurs": 1, "Project Value": 1000000,
+        "Sub Total": 600000, "Penalty": 10000, "Warranty": 5000,
+        "Total Cost": 615000, "CM Booked": 385000, "CR Booked": 0.385,
+    }
+    exp.update(overrides)
+    return exp
+
+CASES = [
+    {"name": "header_search", "cells": _cells(), "rows": ROWS, "expected": _expected()},
+    {"name": "header_search_moved",
+     "cells": _cells(J3=None, K3=None, J4=None, K4=None, D7="Cust:", E7="CV Jaya", D8="PROJECT NO.", E8="PRJ-077"),
+     "rows": ROWS, "expected": _expected(**{"Project No": "PRJ-077", "Cust Name": "CV Jaya"})},
+    {"name": "fallback_k4", "cells": _cells(J4=None), "rows": ROWS, "expected": _expected()},
+    {"name": "fallback_h4",
+     "cells": _cells(J3=None, K3=None, J4=None, K4=None, H3="PT Lama", H4="PRJ-H4"),
+     "rows": ROWS, "expected": _expected(**{"Project No": "PRJ-H4", "Cust Name": "PT Lama"})},
+    {"name": "warranty_typo", "cells": _cells(),
+     "rows": [r if r[0] != "WARRANTY" else ("WARRANTTY", 7000) for r in ROWS],
+     "expected": _expected(Warranty=7000)},
+    {"name": "first_match_wins", "cells": _cells(), "rows": ROWS + [("SUB TOTAL", 1), ("TOTAL COST", 2)],
+     "expected": _expected()},
+    {"name": "currency_usd",
+     "cells": _cells(A5="Sales price in usd excl. VAT", B4=15500, B5=1000),
+     "rows": ROWS, "expected": _expected(Currency="USD", Kurs=15500, **{"Project Value": 1000})},
+    {"name": "currency_text_values",
+     "cells": _cells(A5="Sales price in EUR excl. VAT", B4="Rp 16.900,50", B5="2.500"),
+     "rows": ROWS, "expected": _expected(Currency="EUR", Kurs=16900.5, **{"Project Value": 2500})},
+    {"name": "missing_project_value", "cells": _cells(B5=None), "rows": ROWS,
+     "expected": _expected(status="DATA INCOMPLETE", msg="Project Value 0/Kosong", **{"Project Value": 0})},
+    {"name": "missing_sub_total", "cells": _cells(), "rows": [r for r in ROWS if r[0] != "SUB TOTAL"],
+     "expected": _expected(status="DATA INCOMPLETE", msg="Sub Total Kosong/Gagal Parse", **{"Sub Total": 0})},
+    {"name": "missing_date", "cells": _cells(B3=None), "rows": ROWS,
+     "expected": _expected(status="DATA INCOMPLETE", msg="Tanggal Proyek Kosong", **{"Proj Date": ""})},
+    {"name": "missing_project_no", "cells": _cells(J3=None, K3=None, J4=None, K4=None), "rows": ROWS,
+     "expected": _expected(status="PARSING ERROR", msg="Project No Kosong",
+                           **{"Project No": None, "Cust Name": None})},
+]
+
+FIRST_COST_ROW = 11 # Baris Excel (1-based); parser memindai mulai index 9
+
+def write_xlsx(path, case):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for addr, value in case["cells"].items():
+        ws[addr] = value
+    for i, (label, value) in enumerate(case["rows"]):
+        ws.cell(row=FIRST_COST_ROW + i, column=1, value=label)
+        ws.cell(row=FIRST_COST_ROW + i, column=5, value=value)
+    wb.save(path)
+    return path
+
+def write_xls(path, case):
+    if xlwt is None:
+        fixture = os.path.join(FIXTURE_DIR, f"{case['name']}.xls")
+        if not os.path.exists(fixture):
+            raise RuntimeError(f"Fixture {case['name']}.xls tidak ada dan xlwt tidak terpasang (pip install xlwt)")
+        shutil.copyfile(fixture, path)
+        return path
+    wb = xlwt.Workbook()
+    ws = wb.add_sheet("PCM")
+    date_style = xlwt.easyxf(num_format_str="DD-MMM-YY")
+    for addr, value in case["cells"].items():
+        r, c = addr_to_index(addr)
+        if isinstance(value, datetime):
+            ws.write(r, c, value, date_style)
+        else:
+            ws.write(r, c, value)
+    for i, (label, value) in enumerate(case["rows"]):
+        ws.write(FIRST_COST_ROW - 1 + i, 0, label)
+        ws.write(FIRST_COST_ROW - 1 + i, 4, value)
+    wb.save(path)
+    return path
+
+WRITERS = {".xlsx": write_xlsx, ".xls": write_xls}
+
+def available_extensions():
+    return tuple(ext for ext in WRITERS if ext != ".xls" or xlwt is not None or os.path.isdir(FIXTURE_DIR))
+
+def build_corpus(folder, extensions=None, cases=CASES):
+    """Tulis semua kasus ke folder. Return {(nama kasus, ext): path}."""
+    paths = {}
+    for ext in extensions or available_extensions():
+        for case in cases:
+            path = os.path.join(folder, f"{case['name']}{ext}")
+            paths[(case["name"], ext)] = WRITERS[ext](path, case)
+    return paths
+
+def large_case(rows=140):
+    """Kasus untuk uji latensi: sheet penuh sampai batas pemindaian parser (150 baris)."""
+    filler = [(f"ITEM {i}", i * 1000) for i in range(rows - len(ROWS))]
+    return {"name": "large", "cells": _cells(), "rows": filler + ROWS, "expected": _expected()}
+
+if __name__ == "__main__":
+    # Buat ulang fixture .xls yang disimpan di repository (butuh xlwt)
+    if xlwt is None: raise SystemExit("xlwt tidak terpasang (pip install xlwt)")
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    paths = build_corpus(FIXTURE_DIR, extensions=[".xls"], cases=CASES + [large_case()])
+    print(f"{len(paths)} fixture ditulis ke {FIXTURE_DIR}")
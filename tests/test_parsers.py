@@ -0,0 +1,150 @@
+import os
+import time
+import statistics
+from datetime import datetime
+
+import pytest
+
+from corpus import CASES, available_extensions, build_corpus, large_case
+from helpers import addr_to_index
+from parsers import ExcelAdapter, extract_common_logic, extract_dispatcher, parse_xls_classic, parse_xlsx_modern
+from rules import validate_record
+from sandbox import IsolatedParser
+
+# ==========================================
+# ENGINE PARSER
+# ==========================================
+# Semua engine harus menghasilkan record yang sama untuk satu kasus:
+# adapter langsung (path), dispatcher, dan parser
+# di proses terisolasi.
+
+class DictAdapter(ExcelAdapter):
+    """Adapter tanpa file: sel diambil dari definisi kasus korpus."""
+
+    def __init__(self, case):
+        self.cells = {}
+        for addr, value in case["cells"].items():
+            self.cells[addr_to_index(addr)] = value
+        for i, (label, value) in enumerate(case["rows"]):
+            self.cells[(10 + i, 0)] = label
+            self.cells[(10 + i, 4)] = value
+        self._max_rows = max(r for r, _ in self.cells) + 1
+
+    def get_val(self, row, col):
+        return self.cells.get((row, col))
+
+    def get_date_tuple(self, row, col):
+        val = self.get_val(row, col)
+        if isinstance(val, datetime):
+            return val.strftime("%d-%b-%y"), val
+        return str(val) if val else "", datetime.min
+
+    @property
+    def max_rows(self):
+        return self._max_rows
+
+_isolated = {}
+
+def _isolated_parse(path):
+    if "parser" not in _isolated:
+        _isolated["parser"] = IsolatedParser(timeout=30)
+    return _isolated["parser"].parse(path)
+
+# nama engine -> (ekstensi yang didukung, fungsi path -> record)
+ENGINES = {
+    "openpyxl": ((".xlsx",), parse_xlsx_modern),
+    "xlrd": ((".xls",), parse_xls_classic),
+    "dispatcher": ((".xlsx", ".xls"), extract_dispatcher),
+    "isolated": ((".xlsx", ".xls"), _isolated_parse),
+}
+
+ENGINE_PARAMS = [(name, ext) for name, (exts, _) in ENGINES.items() for ext in exts]
+
+@pytest.fixture(scope="module", autouse=True)
+def _close_isolated_parser():
+    yield
+    parser = _isolated.pop("parser", None)
+    if parser: parser.close()
+
+def _skip_unavailable(ext):
+    if ext not in available_extensions():
+        pytest.skip(f"Fixture {ext} tidak bisa dibuat (xlwt tidak terpasang, tests/fixtures tidak ada)")
+
+def _norm(value):
+    """xlrd mengembalikan "" untuk sel kosong, openpyxl None."""
+    return None if value == "" else value
+
+def assert_golden(record, expected):
+    # Adapter langsung belum divalidasi (validasi dijalankan di extract_dispatcher)
+    record = validate_record(dict(record))
+    for key, value in expected.items():
+        if key in ("status", "msg", "Proj Date"):
+            assert record.get(key) == value, key
+        else:
+            assert _norm(record.get(key)) == _norm(value), key
+
+# ==========================================
+# GOLDEN RECORD
+# ==========================================
+
+@pytest.mark.parametrize("case", CASES, ids=[c["name"] for c in CASES])
+def test_common_logic_golden(case):
+    assert_golden(extract_common_logic(DictAdapter(case)), case["expected"])
+
+@pytest.mark.parametrize("engine,ext", ENGINE_PARAMS, ids=[f"{n}{e}" for n, e in ENGINE_PARAMS])
+@pytest.mark.parametrize("case", CASES, ids=[c["name"] for c in CASES])
+def test_engine_golden(corpus, case, engine, ext):
+    _skip_unavailable(ext)
+    record = ENGINES[engine][1](corpus[(case["name"], ext)])
+    assert_golden(record, case["expected"])
+
+def test_date_sort_key(corpus):
+    for ext in available_extensions():
+        record = extract_dispatcher(corpus[("header_search", ext)])
+        assert record["_sort_date"] == datetime(2024, 3, 15)
+        record = extract_dispatcher(corpus[("missing_date", ext)])
+        assert record["_sort_date"] == datetime.min
+
+def test_broken_and_unsupported_files(tmp_path):
+    broken = tmp_path / "broken.xlsx"
+    broken.write_bytes(b"not a zip")
+    assert extract_dispatcher(str(broken))["status"] == "ERROR"
+    assert extract_dispatcher(str(tmp_path / "notes.txt"))["status"] == "SKIP"
+
+# ==========================================
+# LATENSI PER FILE
+# ==========================================
+# Budget (detik, median beberapa kali parse) untuk sheet penuh 150 baris.
+# Hanya dijalankan dengan PCM_PERF=1 (lihat conftest.py); PCM_PERF_SCALE
+# memperbesar budget di mesin yang lambat.
+
+LATENCY_BUDGET = {
+    "openpyxl": 0.1,
+    "xlrd": 0.05,
+    "dispatcher": 0.1,
+    "isolated": 0.15, # + IPC ke proses parser
+}
+PERF_REPEAT = 5
+
+@pytest.fixture(scope="module")
+def large_corpus(tmp_path_factory):
+    return build_corpus(str(tmp_path_factory.mktemp("large")), cases=[large_case()])
+
+@pytest.mark.perf
+@pytest.mark.parametrize("engine,ext", ENGINE_PARAMS, ids=[f"{n}{e}" for n, e in ENGINE_PARAMS])
+def test_engine_latency(large_corpus, engine, ext):
+    _skip_unavailable(ext)
+    parse = ENGINES[engine][1]
+    path = large_corpus[("large", ext)]
+    parse(path) # Pemanasan (import, spawn proses parser)
+
+    timings = []
+    for _ in range(PERF_REPEAT):
+        t0 = time.perf_counter()
+        record = parse(path)
+        timings.append(time.perf_counter() - t0)
+    assert_golden(record, large_case()["expected"])
+
+    budget = LATENCY_BUDGET[engine] * float(os.environ.get("PCM_PERF_SCALE", "1"))
+    median = statistics.median(timings)
+    assert median <= budget, f"{engine}{ext}: {median * 1000:.1f} ms > budget {budget * 1000:.0f} ms"
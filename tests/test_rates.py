@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from rates import RateTable, apply_rates
+from retry import LOCKED_STATUS
+from rules import validate_record
+
+TABLE = RateTable([("USD", datetime(2024, 3, 1), 15500)])
+
+def _record(kurs, status="OK"):
+    return {"filename": "a.xlsx", "status": status, "Project No": "P-1", "Cust Name": "PT A",
+            "Proj Date": "15-Mar-24", "_sort_date": datetime(2024, 3, 15), "Currency": "USD",
+            "Kurs": kurs, "Project Value": 1000, "Sub Total": 500}
+
+def test_missing_kurs_taken_from_table():
+    item = _record(0)
+    apply_rates([item], TABLE)
+    assert item["Kurs"] == 15500 and item["kurs_source"] == "tabel"
+
+def test_validated_record_is_reapplied():
+    item = validate_record(_record(15000))
+    item["status"] = "DUPLIKAT" # Status setelah validasi tidak menghalangi penerapan ulang
+    apply_rates([item], TABLE)
+    assert item["Kurs"] == 15000 and item["kurs_source"] == "B4"
+
+def test_unparsed_records_are_untouched():
+    locked = {"filename": "b.xlsx", "status": LOCKED_STATUS, "Currency": "USD",
+              "_sort_date": datetime(2024, 3, 15), "msg": "locked"}
+    error = dict(locked, status="ERROR")
+    apply_rates([locked, error], TABLE)
+    for item in (locked, error):
+        assert "Kurs" not in item and "kurs_source" not in item and "_kurs_b4" not in item
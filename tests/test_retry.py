@@ -0,0 +1,65 @@
+import os
+import time
+
+from corpus import CASES, write_xlsx
+from retry import RetryScheduler, is_readable, is_transient_failure, LOCKED_STATUS
+from scanner import retry_files, scan_folder
+from store import ResultStore, file_signature
+from sandbox import IsolatedParser
+
+def _partial_copy(src, dst):
+    with open(src, 'rb') as f:
+        data = f.read()
+    with open(dst, 'wb') as f:
+        f.write(data[:len(data) // 2])
+    return data
+
+def test_backoff_grows_and_gives_up(tmp_path):
+    path = str(tmp_path / "a.xlsx")
+    open(path, 'wb').close()
+    sched = RetryScheduler(base_delay=1.0, max_delay=3.0, max_attempts=3)
+    delays = []
+    for _ in range(3):
+        assert sched.schedule(path)
+        delays.append(round(sched.next_delay()))
+    assert delays == [1, 2, 3]
+    assert not sched.schedule(path) # Percobaan ke-4 melewati batas
+    assert path not in sched and sched.next_delay() is None
+
+def test_partial_write_is_transient_and_retried(tmp_path):
+    good = write_xlsx(str(tmp_path / "good.xlsx"), CASES[0])
+    folder = tmp_path / "in"
+    folder.mkdir()
+    target = str(folder / "copying.xlsx")
+    data = _partial_copy(good, target)
+    assert not is_readable(target)
+    assert is_transient_failure(target, file_signature(target))
+
+    store = ResultStore()
+    sched = RetryScheduler(base_delay=0.01)
+    [record] = scan_folder(str(folder), store, retry=sched)
+    assert record["status"] == LOCKED_STATUS
+    assert target in sched and not store.has(target, file_signature(target))
+
+    with open(target, 'wb') as f:
+        f.write(data) # Copy selesai
+    time.sleep(0.05)
+    assert sched.pop_due() == [] # Signature berubah sejak dijadwalkan -> tunggu sampai stabil
+    time.sleep(0.05)
+    ready = sched.pop_due()
+    assert ready == [target]
+
+    parser = IsolatedParser(timeout=30)
+    try:
+        [record] = retry_files(ready, store, parser, retry=sched)
+    finally:
+        parser.close()
+    assert record["status"] == "OK" and len(sched) == 0
+
+def test_old_corrupt_file_is_permanent_error(tmp_path):
+    path = str(tmp_path / "broken.xlsx")
+    with open(path, 'wb') as f:
+        f.write(b"not a zip")
+    old = time.time() - 3600
+    os.utime(path, (old, old))
+    assert not is_transient_failure(path, file_signature(path))
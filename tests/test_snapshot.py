@@ -0,0 +1,104 @@
+from datetime import datetime
+
+from snapshot import SCAN_SNAPSHOT, Snapshot, StoredSnapshot, change_rows, load_generate_snapshot, save_generate_snapshot
+from store import RecordDB
+
+def _record(name, total_cost=100, status="OK", pid=None):
+    return {"filename": name, "status": status, "Project No": pid or name.upper(), "Cust Name": "PT A",
+            "Proj Date": "15-Mar-24", "Currency": "IDR", "Kurs": 1, "Project Value": 1000,
+            "Sub Total": 50, "Penalty": 0, "Warranty": 0, "Total Cost": total_cost,
+            "CM Booked": 900, "CR Booked": 0.9}
+
+def test_diff_added_removed_modified():
+    old = Snapshot.from_records([_record("a"), _record("b"), _record("c")])
+    new = Snapshot.from_records([_record("a"), _record("b", total_cost="250"), _record("d")])
+    diff = new.diff(old)
+    assert diff.added == ["d"]
+    assert diff.removed == ["c"]
+    assert diff.modified == {"b": {"Total Cost": (100.0, 250.0)}}
+
+def test_number_formatting_is_not_a_change():
+    old = Snapshot.from_records([_record("a", total_cost=100)])
+    new = Snapshot.from_records([_record("a", total_cost=100.0)])
+    assert not new.diff(old)
+
+def test_first_snapshot_is_all_added():
+    diff = Snapshot.from_records([_record("a")]).diff(None)
+    assert diff.added == ["a"] and not diff.removed and not diff.modified
+
+def test_change_rows():
+    old = Snapshot.from_records([_record("a"), _record("b")])
+    new = Snapshot.from_records([_record("a", status="DUPLIKAT")])
+    rows = list(change_rows(new.diff(old), new, old))
+    assert rows == [("DIHAPUS", "b", "B", "", None, None),
+                    ("BERUBAH", "a", "A", "status", "OK", "DUPLIKAT")]
+
+# ==========================================
+# SNAPSHOT DI RECORDDB (DIFF SQL)
+# ==========================================
+
+def _put(db, *records):
+    db.put_many((f"/in/{r['filename']}", dict(r, _sort_date=datetime(2024, 3, 15)), (1, 1)) for r in records)
+    db.mark_duplicates()
+
+def test_stored_diff_matches_memory_diff(tmp_path):
+    db = RecordDB(db_path=str(tmp_path / "scan.sqlite"))
+    _put(db, _record("a"), _record("b"), _record("c"))
+    db.save_snapshot(SCAN_SNAPSHOT)
+    db.prune(["/in/a", "/in/b"])
+    _put(db, _record("b", total_cost="250"), _record("d"))
+
+    diff = StoredSnapshot(db).diff(StoredSnapshot(db, SCAN_SNAPSHOT))
+    assert diff.added == ["d"]
+    assert diff.removed == ["c"]
+    assert diff.modified == {"b": {"Total Cost": (100.0, 250.0)}}
+    db.close()
+
+def test_scoped_diff_includes_new_duplicates(tmp_path):
+    db = RecordDB(db_path=str(tmp_path / "scan.sqlite"))
+    _put(db, _record("a", pid="P-1"), _record("b", status="TERKUNCI", pid=""), _record("c"))
+    db.save_snapshot(SCAN_SNAPSHOT)
+    _put(db, _record("b", pid="P-1")) # File terkunci berhasil dibaca -> a & b DUPLIKAT
+
+    diff = StoredSnapshot(db).diff(StoredSnapshot(db, SCAN_SNAPSHOT), keys=["b"])
+    assert diff.modified["a"] == {"status": ("OK", "DUPLIKAT")}
+    assert diff.modified["b"]["status"] == ("TERKUNCI", "DUPLIKAT")
+    assert "c" not in diff.modified
+    db.save_snapshot(SCAN_SNAPSHOT, keys=["b"])
+    assert not StoredSnapshot(db).diff(StoredSnapshot(db, SCAN_SNAPSHOT))
+    db.close()
+
+def test_generate_snapshot_file(tmp_path):
+    db = RecordDB(db_path=str(tmp_path / "scan.sqlite"))
+    assert load_generate_snapshot(str(tmp_path), db) is None
+    _put(db, _record("a"), _record("b"))
+    save_generate_snapshot(str(tmp_path), db)
+    db.prune(["/in/a"])
+    _put(db, _record("a", status="DATA INCOMPLETE"))
+
+    previous = load_generate_snapshot(str(tmp_path), db)
+    current = StoredSnapshot(db)
+    rows = list(change_rows(current.diff(previous), current, previous))
+    assert rows == [("DIHAPUS", "b", "B", "", None, None),
+                    ("BERUBAH", "a", "A", "status", "OK", "DATA INCOMPLETE")]
+    db.close()
+
+def test_scoped_mark_duplicates(tmp_path):
+    db = RecordDB(db_path=str(tmp_path / "scan.sqlite"))
+    _put(db, _record("a", pid="P-1"), _record("c", pid="P-2"), _record("d", pid="P-2"))
+    db.conn.execute("UPDATE records SET scan_status = 'OK'") # Grup P-2 sengaja belum ditandai
+    db.put("/in/b", dict(_record("b", pid="P-1"), _sort_date=datetime(2024, 3, 15)), (1, 1))
+    db.mark_duplicates([_record("b", pid="P-1")])
+    status = {r["filename"]: r["status"] for r in db.records()}
+    assert status == {"a": "DUPLIKAT", "b": "DUPLIKAT", "c": "OK", "d": "OK"}
+    db.close()
+
+def test_memory_snapshot_update_and_merge():
+    snap = Snapshot.from_records([_record("a"), _record("b")])
+    diff = snap.update([_record("b", status="DUPLIKAT"), _record("c")])
+    assert diff.added == ["c"] and diff.modified == {"b": {"status": ("OK", "DUPLIKAT")}}
+    assert not diff.removed # Record di luar update tidak dianggap dihapus
+    assert sorted(snap.entries) == ["a", "b", "c"]
+
+    diff.merge(Snapshot.from_records([_record("a", total_cost=5)]).diff(Snapshot.from_records([_record("a")])))
+    assert set(diff.modified) == {"a", "b"}
@@ -0,0 +1,89 @@
+import os
+import pickle
+from datetime import datetime
+
+import pytest
+
+from store import RecordDB
+from summary import partition_records, write_partitioned_workbooks
+
+def _record(name, year, status="OK"):
+    return {"filename": name, "path": f"/in/{name}", "status": status, "Project No": name.upper(),
+            "Cust Name": "PT A", "Proj Date": f"15-Mar-{year % 100:02d}", "_sort_date": datetime(year, 3, 15),
+            "Currency": "IDR", "Kurs": 1, "Project Value": 1000}
+
+@pytest.fixture
+def db(tmp_path):
+    db = RecordDB(db_path=str(tmp_path / "scan.sqlite"))
+    db.put_many((f"/in/{n}", _record(n, y), (1, 1)) for n, y in [("a", 2024), ("b", 2023), ("c", 2024)])
+    yield db
+    db.close()
+
+def test_frozen_copy_ignores_later_writes(db):
+    frozen = db.records().freeze()
+    db.put("/in/d", _record("d", 2025), (1, 1))
+    db.prune(["/in/a"])
+    assert [r["filename"] for r in frozen] == ["b", "a", "c"]
+    assert len(frozen) == 3
+
+    path = frozen.db.db_path
+    frozen.db.close()
+    assert not os.path.exists(path)
+
+def test_partitions_stream_from_sql(db):
+    frozen = db.records().freeze()
+    try:
+        parts = partition_records(frozen, "year")
+        assert list(parts) == ["2023", "2024"]
+        assert [r["filename"] for r in parts["2024"]] == ["a", "c"]
+        assert len(parts["2023"]) == 1
+        # Dikirim ke proses penulis summary: dibuka ulang read-only dari path DB
+        clone = pickle.loads(pickle.dumps(parts["2024"]))
+        assert [r["filename"] for r in clone] == ["a", "c"]
+        clone.db.close()
+    finally:
+        frozen.db.close()
+
+def test_read_view_keeps_rows_stable_during_writes(db):
+    view = db.read_view()
+    try:
+        db.put("/in/d", _record("d", 2022), (1, 1))
+        db.prune(["/in/d"])
+        assert view.count() == 3
+        assert [r["filename"] for r in view.page(0, 10)] == ["b", "a", "c"]
+    finally:
+        view.close()
+    assert db.count() == 1
+
+def test_partition_files_skip_undated_and_drop_stale(db, tmp_path):
+    db.put("/in/e", dict(_record("e", 2024), status="ERROR", _sort_date=datetime.min, **{"Proj Date": ""}), (1, 1))
+    out = tmp_path / "out"
+    out.mkdir()
+    (out / "PCM 2024 SUMMARY.xlsx").write_bytes(b"single") # Hasil mode satu sheet tidak boleh tertimpa
+
+    frozen = db.records().freeze()
+    try:
+        write_partitioned_workbooks(str(out), frozen, "year")
+    finally:
+        frozen.db.close()
+    assert sorted(os.listdir(out)) == ["PCM 2024 SUMMARY.xlsx", "PCM PARTISI 2023 SUMMARY.xlsx",
+                                       "PCM PARTISI 2024 SUMMARY.xlsx", "PCM PARTISI Tanpa Tanggal SUMMARY.xlsx",
+                                       "PCM SUMMARY ROLLUP.xlsx", "summary_manifest.json"]
+
+    # Tinggal partisi 2023 -> file partisi lain ikut dihapus
+    db.prune(["/in/b"])
+    frozen = db.records().freeze()
+    try:
+        write_partitioned_workbooks(str(out), frozen, "year")
+    finally:
+        frozen.db.close()
+    assert sorted(os.listdir(out)) == ["PCM 2024 SUMMARY.xlsx", "PCM PARTISI 2023 SUMMARY.xlsx",
+                                       "PCM SUMMARY ROLLUP.xlsx", "summary_manifest.json"]
+    assert (out / "PCM 2024 SUMMARY.xlsx").read_bytes() == b"single"
+
+def test_filter_treats_wildcards_literally(db):
+    db.put("/in/p_1", dict(_record("p_1", 2024), **{"Project No": "P_1"}), (1, 1))
+    db.put("/in/px1", dict(_record("px1", 2024), **{"Project No": "PX1", "Cust Name": "PT 100%"}), (1, 1))
+    assert [r["filename"] for r in db.page(0, 10, filter_text="p_1")] == ["p_1"]
+    assert [r["filename"] for r in db.page(0, 10, filter_text="100%")] == ["px1"]
+    assert db.count("%") == 1
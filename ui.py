@@ -1,14 +1,19 @@
 import os
 import sys 
+import threading
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, 
                                QHBoxLayout, QPushButton, QLabel, QProgressBar, 
-                               QTableWidget, QTableWidgetItem, QFileDialog, 
+                               QTableView, QLineEdit, QFileDialog, 
                                QMessageBox, QHeaderView, QAbstractItemView,
-                               QDialog, QTextEdit)
-from PySide6.QtCore import Qt, QSettings, QUrl, QTimer
-from PySide6.QtGui import QColor, QDesktopServices, QFont
+                               QDialog, QTextEdit, QComboBox, QCheckBox)
+from PySide6.QtCore import Qt, QSettings, QUrl
+from PySide6.QtGui import QDesktopServices, QFont
 
-from workers import WatcherThread, PreviewWorker, GeneratorWorker
+from workers import WatcherThread, PreviewWorker, GeneratorWorker, RetryWorker
+from retry import RetryScheduler
+from store import RecordDB
+from exporters import available_formats
+from table_model import RecordTableModel
 
 # --- KELAS DIALOG BANTUAN ---
 class HelpDialog(QDialog):
@@ -61,21 +66,32 @@ class MainWindow(QMainWindow):
         btn_output.clicked.connect(self.select_output)
         h2.addWidget(self.lbl_output); h2.addWidget(btn_output)
         
-        layout_io.addLayout(h1); layout_io.addLayout(h2)
+        h_rates = QHBoxLayout()
+        self.lbl_rates = QLabel("Tabel Kurs: (Tidak dipakai, Kurs dari B4)")
+        self.lbl_rates.setStyleSheet("background: #fff8e1; padding: 5px; border-radius: 4px;")
+        btn_rates = QPushButton("Pilih Tabel Kurs (CSV)")
+        btn_rates.setToolTip("CSV dengan kolom currency,date,rate.\n"
+                             "Dipakai jika Kurs B4 kosong atau tidak wajar untuk mata uang asing.")
+        btn_rates.clicked.connect(self.select_rates)
+        btn_rates_clear = QPushButton("Lepas")
+        btn_rates_clear.clicked.connect(lambda: self.set_rates_path(""))
+        h_rates.addWidget(self.lbl_rates); h_rates.addWidget(btn_rates); h_rates.addWidget(btn_rates_clear)
+        
+        layout_io.addLayout(h1); layout_io.addLayout(h2); layout_io.addLayout(h_rates)
         layout.addWidget(grp_io)
         
-        # --- TABLE ---
-        self.table = QTableWidget()
-        
-        # UPDATE KOLOM: Status dipindah ke index 1, dan semua data ditampilkan
-        cols = [
-            "Nama File Asli", "Status", "Project No", "Customer", "Proj Date", 
-            "Ccy", "Kurs", "Project Value", "Sub Total", "Penalty", 
-            "Warranty", "Total Cost", "CM Booked", "CR Booked"
-        ]
+        # --- PENCARIAN ---
+        self.txt_search = QLineEdit()
+        self.txt_search.setPlaceholderText("🔍 Cari Project No / Customer / Status...")
+        self.txt_search.setClearButtonEnabled(True)
+        self.txt_search.textChanged.connect(lambda text: self.table_model.set_filter(text))
+        layout.addWidget(self.txt_search)
         
-        self.table.setColumnCount(len(cols))
-        self.table.setHorizontalHeaderLabels(cols)
+        # --- TABLE ---
+        # Data & sorting bertipe ada di RecordTableModel (table_model.py)
+        self.table_model = RecordTableModel(self, memory_cap_mb=self.settings.value("memory_cap_mb", 32, type=int))
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table.setSelectionMode(QAbstractItemView.SingleSelection)
         self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
@@ -93,13 +109,46 @@ class MainWindow(QMainWindow):
         self.table.setColumnWidth(7, 120) # Project Value
         
         # --- FITUR SORTING ---
+        # Default tanpa sort kolom (urutan tanggal dari worker dipertahankan)
+        header.setSortIndicator(-1, Qt.AscendingOrder)
         self.table.setSortingEnabled(True)
         
         # --- FITUR DOUBLE CLICK ---
-        self.table.cellDoubleClicked.connect(self.on_table_double_click)
+        self.table.doubleClicked.connect(self.on_table_double_click)
         
         layout.addWidget(self.table)
         
+        # --- OPSI OUTPUT ---
+        h_opt = QHBoxLayout()
+        data_fmt = "/".join(f.upper() for f in available_formats())
+        self.cmb_output = QComboBox()
+        self.cmb_output.addItem("Excel Summary", "xlsx")
+        self.cmb_output.addItem(f"Excel Summary + Data ({data_fmt})", "xlsx+data")
+        self.cmb_output.addItem(f"Data saja ({data_fmt})", "data")
+        self.cmb_output.currentIndexChanged.connect(
+            lambda _: self.settings.setValue("output_mode", self.cmb_output.currentData()))
+        h_opt.addWidget(QLabel("Format Output:")); h_opt.addWidget(self.cmb_output)
+        self.chk_values = QCheckBox("Tulis nilai (tanpa rumus Excel)")
+        self.chk_values.setToolTip("Proj IDR, Cost, CM IDR, CM %, Cost % dan Grand Total dihitung oleh aplikasi.\n"
+                                   "File lebih cepat dibuka untuk data besar.")
+        self.chk_values.toggled.connect(lambda on: self.settings.setValue("write_values", on))
+        h_opt.addWidget(self.chk_values)
+        self.chk_changes = QCheckBox("Sheet perubahan")
+        self.chk_changes.setToolTip("Tambah sheet PERUBAHAN: record baru, dihapus, dan nilai yang berubah\n"
+                                    "sejak generate terakhir ke folder output yang sama.")
+        self.chk_changes.toggled.connect(lambda on: self.settings.setValue("write_changes", on))
+        h_opt.addWidget(self.chk_changes)
+        self.cmb_partition = QComboBox()
+        self.cmb_partition.addItem("Satu sheet (semua data)", "")
+        self.cmb_partition.addItem("Per tahun proyek (sheet)", "year|sheets")
+        self.cmb_partition.addItem("Per tahun proyek (file terpisah)", "year|workbooks")
+        self.cmb_partition.addItem("Per customer (file terpisah)", "Cust Name|workbooks")
+        self.cmb_partition.currentIndexChanged.connect(
+            lambda _: self.settings.setValue("partition_mode", self.cmb_partition.currentData()))
+        h_opt.addWidget(QLabel("Partisi Summary:")); h_opt.addWidget(self.cmb_partition)
+        h_opt.addStretch()
+        layout.addLayout(h_opt)
+        
         # --- ACTION ---
         h3 = QHBoxLayout()
         self.progress = QProgressBar()
@@ -113,12 +162,13 @@ class MainWindow(QMainWindow):
         self.setup_statusbar()
         self.input_dir = ""; self.output_dir = ""; self.data_cache = []
         self.scan_worker = None; self.gen_worker = None
+        self.result_store = None # RecordDB (SQLite) per folder input, dipakai ulang antar scan
+        self.rescan_pending = False
+        self.rates_path = "" # CSV tabel kurs (setting "rates_path")
+        self.retry_scheduler = None; self.retry_worker = None # Retry file terkunci per folder input
+        self.parse_lock = threading.Lock() # Scan & retry tidak mem-parse bersamaan
+        self.retry_diffs = [] # Diff retry yang tiba saat scan berjalan (digabung di on_preview_done)
         self.watcher_thread = None
-        
-        self.debounce_timer = QTimer()
-        self.debounce_timer.setSingleShot(True)
-        self.debounce_timer.setInterval(1500)
-        self.debounce_timer.timeout.connect(self.run_preview_scan)
 
         self.load_settings()
 
@@ -168,6 +218,16 @@ class MainWindow(QMainWindow):
         self.help_window.activateWindow()
 
     def load_settings(self):
+        idx = self.cmb_output.findData(self.settings.value("output_mode", "xlsx"))
+        if idx >= 0: self.cmb_output.setCurrentIndex(idx)
+        self.chk_values.setChecked(self.settings.value("write_values", False, type=bool))
+        self.chk_changes.setChecked(self.settings.value("write_changes", False, type=bool))
+        idx = self.cmb_partition.findData(self.settings.value("partition_mode", ""))
+        if idx >= 0: self.cmb_partition.setCurrentIndex(idx)
+        
+        self.rates_path = self.settings.value("rates_path", "")
+        if self.rates_path: self.lbl_rates.setText(f"Tabel Kurs: {self.rates_path}")
+        
         last_in = self.settings.value("last_input_dir")
         last_out = self.settings.value("last_output_dir")
         if last_in and os.path.exists(last_in):
@@ -199,109 +259,125 @@ class MainWindow(QMainWindow):
             self.settings.setValue("last_output_dir", path)
             self.check_ready()
 
+    def select_rates(self):
+        start_dir = os.path.dirname(self.rates_path) if self.rates_path else ""
+        path, _ = QFileDialog.getOpenFileName(self, "Pilih Tabel Kurs", start_dir, "CSV (*.csv)")
+        if path: self.set_rates_path(path)
+
+    def set_rates_path(self, path):
+        if path == self.rates_path: return
+        self.rates_path = path
+        self.settings.setValue("rates_path", path)
+        if self.retry_worker: self.retry_worker.rates_path = path
+        self.lbl_rates.setText(f"Tabel Kurs: {path}" if path else "Tabel Kurs: (Tidak dipakai, Kurs dari B4)")
+        # Kurs record yang sudah ada diperbarui tanpa parse ulang (scanner.refresh_rates)
+        if self.input_dir: self.run_preview_scan()
+
     def start_watcher(self):
         if self.watcher_thread: self.watcher_thread.stop(); self.watcher_thread.wait()
         self.watcher_thread = WatcherThread(self.input_dir)
-        self.watcher_thread.folder_changed.connect(self.on_folder_change_detected)
+        self.watcher_thread.change_detected.connect(self.on_folder_change_detected)
+        self.watcher_thread.folder_changed.connect(self.on_folder_settled)
         self.watcher_thread.start()
 
     def on_folder_change_detected(self):
-        self.statusBar().showMessage("🔍 Mendeteksi perubahan file... Menunggu...", 2000)
-        self.debounce_timer.start()
+        self.statusBar().showMessage("🔍 Mendeteksi perubahan file... Menunggu file selesai ditulis...")
+
+    def on_folder_settled(self, paths):
+        # Debounce & deteksi file stabil sudah dilakukan oleh WatcherThread
+        if self.retry_scheduler and all(p in self.retry_scheduler for p in paths):
+            # Hanya file terkunci yang berubah -> parse ulang file itu saja
+            self.statusBar().showMessage(f"♻️ {len(paths)} file terkunci berubah. Membaca ulang...", 2000)
+            self.retry_worker.wake(paths)
+            return
+        self.statusBar().showMessage(f"🔄 {len(paths)} file berubah. Memindai ulang...", 2000)
+        self.run_preview_scan()
 
     def run_preview_scan(self):
-        self.table.setSortingEnabled(False)
-        self.table.setRowCount(0)
+        # Generate berjalan -> scan ditunda sampai selesai (DB tidak ditutup/diganti di tengah generate)
+        if self.gen_worker and self.gen_worker.isRunning():
+            self.rescan_pending = True
+            return
+        # Scan masih berjalan -> batalkan, lalu jadwalkan SATU scan ulang
+        if self.scan_worker and self.scan_worker.isRunning():
+            self.rescan_pending = True
+            self.scan_worker.requestInterruption()
+            return
+        
+        self.rescan_pending = False
         self.btn_gen.setEnabled(False)
-        self.scan_worker = PreviewWorker(self.input_dir)
+        self.data_cache = []
+        # Tabel tetap ditampilkan (isi DB sebelum scan) selama scan ulang; diperbarui dari diff di on_preview_done
+        if self.result_store is None or self.result_store.folder_path != self.input_dir:
+            self.table_model.set_source(None)
+            self.stop_retry_worker()
+            self.retry_diffs = []
+            if self.result_store is not None: self.result_store.close()
+            self.result_store = RecordDB(self.input_dir)
+            self.start_retry_worker()
+        self.table_model.hold()
+        self.scan_worker = PreviewWorker(self.input_dir, store=self.result_store, rates_path=self.rates_path,
+                                         retry=self.retry_scheduler, parse_lock=self.parse_lock)
         self.scan_worker.progress.connect(self.progress.setValue)
         self.scan_worker.finished.connect(self.on_preview_done)
+        self.scan_worker.cancelled.connect(self.on_preview_cancelled)
         self.scan_worker.start()
-        
-    def on_preview_done(self, results):
-        self.data_cache = results
-        self.table.setRowCount(len(results))
-        
-        for r, item in enumerate(results):
-            status = item["status"]
-            color = QColor(Qt.black)
-            bg_color = QColor(Qt.white)
-            
-            if status == "DUPLIKAT":
-                bg_color = QColor("#FFEB3B"); status = "DUPLIKAT (Diproses)"
-            elif status != "OK":
-                bg_color = QColor("#FFCDD2"); color = QColor(Qt.red)
-            
-            def make_item(text, align_right=False):
-                it = QTableWidgetItem(str(text))
-                it.setForeground(color); it.setBackground(bg_color)
-                if align_right:
-                    it.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                return it
+    
+    def start_retry_worker(self):
+        self.retry_scheduler = RetryScheduler()
+        self.retry_worker = RetryWorker(self.result_store, self.retry_scheduler, rates_path=self.rates_path,
+                                        parse_lock=self.parse_lock)
+        self.retry_worker.files_retried.connect(self.on_files_retried)
+        self.retry_worker.start()
 
-            def format_num(val):
-                if isinstance(val, (int, float)):
-                    return f"{val:,.0f}".replace(",", ".")
-                return str(val)
+    def stop_retry_worker(self):
+        if self.retry_worker: self.retry_worker.stop(); self.retry_worker.wait()
+        self.retry_worker = None; self.retry_scheduler = None
 
-            # MAPPING DATA KE KOLOM TABEL
-            # 0. File Name
-            self.table.setItem(r, 0, make_item(item["filename"]))
-            
-            # 1. Status (DIPINDAHKAN KE SINI)
-            self.table.setItem(r, 1, make_item(status))
-            
-            # 2. Project No
-            self.table.setItem(r, 2, make_item(item.get("Project No", "-")))
-            
-            # 3. Customer
-            self.table.setItem(r, 3, make_item(item.get("Cust Name", "-")))
-            
-            # 4. Proj Date
-            self.table.setItem(r, 4, make_item(item.get("Proj Date", "-")))
-            
-            # 5. Currency
-            self.table.setItem(r, 5, make_item(item.get("Currency", "-")))
-            
-            # 6. Kurs (Number)
-            self.table.setItem(r, 6, make_item(format_num(item.get("Kurs", 0)), True))
-            
-            # 7. Project Value (Number)
-            self.table.setItem(r, 7, make_item(format_num(item.get("Project Value", 0)), True))
-            
-            # 8. Sub Total (Number)
-            self.table.setItem(r, 8, make_item(format_num(item.get("Sub Total", 0)), True))
-            
-            # 9. Penalty (Number)
-            self.table.setItem(r, 9, make_item(format_num(item.get("Penalty", 0)), True))
-            
-            # 10. Warranty (Number)
-            self.table.setItem(r, 10, make_item(format_num(item.get("Warranty", 0)), True))
-            
-            # 11. Total Cost (Number)
-            self.table.setItem(r, 11, make_item(format_num(item.get("Total Cost", 0)), True))
-            
-            # 12. CM Booked (Number)
-            self.table.setItem(r, 12, make_item(format_num(item.get("CM Booked", 0)), True))
-            
-            # 13. CR Booked (Persentase - Opsional, disini saya tampilkan raw atau format number)
-            # Karena di JSON nilainya angka, kita format angka saja
-            self.table.setItem(r, 13, make_item(format_num(item.get("CR Booked", 0)), True))
-        
-        self.table.setSortingEnabled(True)
+    def on_files_retried(self, paths, diff):
+        # Retry selesai sebelum scan mulai (sinyal baru diproses sekarang) -> diterapkan bersama diff scan
+        if self.scan_worker and self.scan_worker.isRunning():
+            self.retry_diffs.append(diff)
+            return
+        self.data_cache = self.result_store.records()
+        self.table_model.apply_diff(self.result_store, diff)
         self.check_ready()
-        self.statusBar().showMessage(f"Scan selesai. Total {len(results)} file.", 3000)
+        self.statusBar().showMessage(f"♻️ {len(paths)} file terkunci berhasil dibaca ulang. Perubahan: {diff.summary()}.", 5000)
 
-    def on_table_double_click(self, row, col):
-        if row < 0 or row >= len(self.data_cache): return
-        
-        filename_in_table = self.table.item(row, 0).text()
-        selected_file = None
-        for item in self.data_cache:
-            if item["filename"] == filename_in_table:
-                selected_file = item
-                break
+    def closeEvent(self, event):
+        self.stop_retry_worker()
+        if self.watcher_thread: self.watcher_thread.stop(); self.watcher_thread.wait()
+        super().closeEvent(event)
+
+    def start_pending_rescan(self):
+        """Jalankan scan yang tertunda (jika ada). Return True jika scan dimulai."""
+        self.scan_worker.wait() # Sinyal dikirim di akhir run(), thread sebentar lagi selesai
+        if not self.rescan_pending: return False
+        self.run_preview_scan()
+        return True
+    
+    def on_preview_cancelled(self):
+        if not self.start_pending_rescan():
+            self.table_model.set_source(self.result_store) # Lepas tampilan isi DB sebelum scan
+            self.retry_diffs = []
+        
+    def on_preview_done(self, results, diff):
+        if self.start_pending_rescan(): return
+        had_snapshot = self.scan_worker.had_snapshot
+        for retry_diff in self.retry_diffs: diff.merge(retry_diff)
+        self.retry_diffs = []
+        self.data_cache = results # RecordSource: dibaca per halaman dari RecordDB
+        self.table_model.apply_diff(self.result_store, diff) # Hanya baris yang berubah di-refresh
+        if self.retry_worker:
+            self.retry_worker.wake() # File TERKUNCI dari scan ini mulai dijadwalkan
         
+        self.check_ready()
+        msg = f"Scan selesai. Total {len(results)} file."
+        if had_snapshot: msg += f" Perubahan: {diff.summary()}."
+        self.statusBar().showMessage(msg, 5000)
+
+    def on_table_double_click(self, index):
+        selected_file = self.table_model.record_at(index.row())
         if not selected_file: return
 
         reply = QMessageBox.question(self, "Edit File Input", 
@@ -319,6 +395,12 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, "Error", "File tidak ditemukan!")
 
     def check_ready(self):
+        # Selama generate tombol tetap nonaktif (mis. retry selesai di tengah generate);
+        # diaktifkan lagi oleh on_generation_finished
+        if self.gen_worker and self.gen_worker.isRunning():
+            self.btn_gen.setEnabled(False)
+            return
+
         # Kita hitung semua file karena worker sekarang memproses semuanya (termasuk Error)
         total_count = len(self.data_cache)
         
@@ -338,6 +420,7 @@ class MainWindow(QMainWindow):
 
     def start_generation(self):
         if not self.output_dir: return
+        if self.gen_worker and self.gen_worker.isRunning(): return # Generate sebelumnya belum selesai
         try:
             files_in_output = [f for f in os.listdir(self.output_dir) if not f.startswith('.')]
             if files_in_output:
@@ -353,7 +436,17 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e)); return
         
-        self.gen_worker = GeneratorWorker(self.data_cache, self.output_dir)
+        output_mode = self.cmb_output.currentData()
+        partition_by, _, partition_layout = (self.cmb_partition.currentData() or "").partition("|")
+        export_formats = available_formats() if output_mode in ("xlsx+data", "data") else ()
+        # Salinan beku: scan ulang / retry selama generate tidak mengubah data yang sedang ditulis
+        self.gen_worker = GeneratorWorker(self.data_cache.freeze(), self.output_dir,
+                                          export_formats=export_formats,
+                                          write_xlsx=output_mode != "data",
+                                          use_formulas=not self.chk_values.isChecked(),
+                                          partition_by=partition_by or None,
+                                          partition_layout=partition_layout or "sheets",
+                                          write_changes=self.chk_changes.isChecked())
         self.gen_worker.log_msg.connect(lambda s: self.progress.setFormat(s))
         self.gen_worker.finished.connect(self.on_generation_finished)
         self.progress.setValue(0); self.progress.setRange(0, 0)
@@ -363,6 +456,8 @@ class MainWindow(QMainWindow):
     def on_generation_finished(self, result_msg):
         self.progress.setRange(0, 100); self.progress.setValue(100); self.progress.setFormat("Selesai")
         self.btn_gen.setEnabled(True); self.btn_gen.setText("GENERATE ULANG")
+        self.gen_worker.wait() # Sinyal dikirim di akhir run(), thread sebentar lagi selesai
+        if self.rescan_pending: self.run_preview_scan() # Scan yang tertunda selama generate
         
         if "ERROR:" in result_msg:
             QMessageBox.critical(self, "Gagal", result_msg)
@@ -1,6 +1,7 @@
 import os
+import time
+import threading
 import shutil
-import openpyxl
 from datetime import datetime
 from PySide6.QtCore import QThread, Signal
 from watchdog.observers import Observer
@@ -8,39 +9,106 @@ from watchdog.events import FileSystemEventHandler
 from PySide6.QtGui import QColor # Tidak dipakai di worker tapi sisa import aman
 
 from helpers import sanitize_filename, extract_year_from_date
-from parsers import extract_dispatcher
+from store import RecordDB, file_signature
+from scanner import scan_folder, retry_files
+from sandbox import IsolatedParser
+from exporters import export_records
+from summary import build_summary_workbook, write_partitioned_sheets, write_partitioned_workbooks
+from snapshot import SCAN_SNAPSHOT, StoredSnapshot, change_rows, load_generate_snapshot, save_generate_snapshot
 
 # ==========================================
 # WATCHER THREAD (MONITORING)
 # ==========================================
 
 class FolderChangeHandler(FileSystemEventHandler):
-    def __init__(self, signal_emitter):
-        self.signal_emitter = signal_emitter
+    # Event yang hanya membaca file (mis. saat scan) tidak dianggap perubahan
+    IGNORED_EVENTS = ("opened", "closed_no_write")
+
+    def __init__(self, on_path_changed):
+        self.on_path_changed = on_path_changed
 
     def on_any_event(self, event):
-        if event.is_directory: return
-        filename = os.path.basename(event.src_path)
-        if filename.startswith("~$"): return
-        if filename.lower().endswith(('.xls', '.xlsx')):
-            self.signal_emitter.emit()
+        if event.is_directory or event.event_type in self.IGNORED_EVENTS: return
+        # Excel menyimpan lewat file temp lalu rename -> cek juga dest_path
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            if not path: continue
+            filename = os.path.basename(path)
+            if filename.startswith("~$"): continue
+            if filename.lower().endswith(('.xls', '.xlsx')):
+                self.on_path_changed(path)
 
 class WatcherThread(QThread):
-    folder_changed = Signal()
+    """
+    Mengumpulkan event file lalu mengirim folder_changed(list path) hanya
+    setelah semua file yang berubah "tenang": size & mtime tidak berubah
+    selama settle_ms, dan tidak ada event baru selama quiet window.
+    Quiet window bertambah panjang jika event datang beruntun (copy massal).
+    """
+    folder_changed = Signal(list)
+    change_detected = Signal()
 
-    def __init__(self, folder_path):
+    def __init__(self, folder_path, settle_ms=1000, quiet_ms=1500, max_quiet_ms=10000):
         super().__init__()
         self.folder_path = folder_path
         self.observer = None
+        self.settle_ms = settle_ms
+        self.quiet_ms = quiet_ms
+        self.max_quiet_ms = max_quiet_ms
+        
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = {} # path -> [signature, stable_since]
+        self._last_event = 0.0
+        self._burst = 0
+
+    def on_path_changed(self, path):
+        """Dipanggil dari thread watchdog untuk setiap event mentah."""
+        with self._lock:
+            if not self._pending: self.change_detected.emit()
+            self._pending[path] = [file_signature(path), time.monotonic()]
+            self._last_event = time.monotonic()
+            self._burst += 1
+        self._wake.set()
+
+    def current_quiet_window(self):
+        return min(self.max_quiet_ms, self.quiet_ms + self._burst * 50) / 1000.0
+
+    def _collect_settled(self):
+        """Return list path jika semua sudah stabil, None jika masih harus menunggu."""
+        now = time.monotonic()
+        with self._lock:
+            if not self._pending: return None
+            if now - self._last_event < self.current_quiet_window(): return None
+            all_stable = True
+            for path, state in self._pending.items():
+                sig = file_signature(path)
+                if sig != state[0]:
+                    state[0] = sig; state[1] = now
+                if now - state[1] < self.settle_ms / 1000.0:
+                    all_stable = False
+            if not all_stable: return None
+            paths = list(self._pending)
+            self._pending.clear()
+            self._burst = 0
+            return paths
 
     def run(self):
         self.observer = Observer()
-        event_handler = FolderChangeHandler(self.folder_changed)
+        event_handler = FolderChangeHandler(self.on_path_changed)
         try:
             self.observer.schedule(event_handler, self.folder_path, recursive=False)
             self.observer.start()
+            poll = min(self.settle_ms, self.quiet_ms) / 4000.0
             while not self.isInterruptionRequested():
-                self.msleep(500)
+                # Tidak ada perubahan -> blok sampai ada event (atau stop)
+                with self._lock:
+                    has_pending = bool(self._pending)
+                self._wake.wait(poll if has_pending else None)
+                self._wake.clear()
+                if self.isInterruptionRequested(): break
+                
+                paths = self._collect_settled()
+                if paths: self.folder_changed.emit(paths)
         except:
             pass
         finally:
@@ -50,66 +118,141 @@ class WatcherThread(QThread):
 
     def stop(self):
         self.requestInterruption()
+        self._wake.set()
 
 # ==========================================
 # WORKER THREADS (SCANNER & GENERATOR)
 # ==========================================
+# PreviewWorker & RetryWorker memakai parse_lock yang sama: retry tidak
+# berjalan selama scan (file tidak di-parse & ditulis dua kali), dan scan
+# menunggu batch retry yang sedang berjalan.
+
+def acquire_lock(lock, should_stop, poll=0.5):
+    """Ambil lock; berhenti menunggu (return False) jika should_stop() bernilai True."""
+    while not should_stop():
+        if lock.acquire(timeout=poll): return True
+    return False
 
 class PreviewWorker(QThread):
     progress = Signal(int)
-    finished = Signal(list)
+    finished = Signal(object, object) # RecordSource (hasil scan di RecordDB), SnapshotDiff
+    cancelled = Signal()
     
-    def __init__(self, folder_path):
+    def __init__(self, folder_path, store=None, timeout=60, mem_limit_mb=1024, rates_path=None, retry=None,
+                 parse_lock=None):
         super().__init__()
+        self.retry = retry # RetryScheduler untuk file terkunci (dijalankan oleh RetryWorker)
+        self.parse_lock = parse_lock or threading.Lock() # Dibagi dengan RetryWorker
+        self.had_snapshot = False # Ada snapshot scan sebelumnya (diff bermakna)
         self.folder_path = folder_path
+        self.rates_path = rates_path # CSV tabel kurs (opsional)
+        self.store = store if store is not None else RecordDB(folder_path)
+        self.timeout = timeout
+        self.mem_limit_mb = mem_limit_mb
         
     def run(self):
+        if not acquire_lock(self.parse_lock, self.isInterruptionRequested):
+            self.cancelled.emit()
+            return
         try:
-            all_files = [f for f in os.listdir(self.folder_path) if f.lower().endswith(('.xls', '.xlsx'))]
-            all_files = [f for f in all_files if not f.startswith("~$")]
-        except:
-            all_files = []
-        
-        total = len(all_files)
-        results = []
-        
-        # 1. PARSE
-        for i, filename in enumerate(all_files):
-            path = os.path.join(self.folder_path, filename)
-            data = extract_dispatcher(path)
-            data["filename"] = filename
-            data["path"] = path
-            results.append(data)
-            if total > 0: self.progress.emit(int((i+1)/total * 100))
+            results = scan_folder(self.folder_path, self.store, 
+                                  progress=self.progress.emit,
+                                  should_cancel=self.isInterruptionRequested,
+                                  timeout=self.timeout, mem_limit_mb=self.mem_limit_mb,
+                                  collect=False, rates_path=self.rates_path, retry=self.retry)
+            if results is None:
+                self.cancelled.emit()
+                return
+            # Diff (SQL) terhadap snapshot scan sebelumnya -> UI hanya memperbarui baris yang berubah
+            self.had_snapshot = self.store.snapshot_taken_at(SCAN_SNAPSHOT) is not None
+            diff = StoredSnapshot(self.store).diff(StoredSnapshot(self.store, SCAN_SNAPSHOT))
+            self.store.save_snapshot(SCAN_SNAPSHOT)
+        finally:
+            self.parse_lock.release()
+        self.finished.emit(results, diff)
 
-        # 2. LOGIKA DUPLIKAT
-        id_counts = {}
-        for item in results:
-            if item["status"] == "OK":
-                pid = str(item.get("Project No", "")).strip()
-                if pid:
-                    id_counts[pid] = id_counts.get(pid, 0) + 1
-        
-        for item in results:
-            if item["status"] == "OK":
-                pid = str(item.get("Project No", "")).strip()
-                if pid and id_counts.get(pid, 0) > 1:
-                    item["status"] = "DUPLIKAT" 
-        
-        # 3. SORTING BY DATE (DEFAULT)
-        results.sort(key=lambda x: x.get("_sort_date", datetime.min))
-        self.finished.emit(results)
+class RetryWorker(QThread):
+    """
+    Mem-parse ulang file TERKUNCI dari RetryScheduler di background saat
+    jatuh tempo (backoff eksponensial) dan file sudah bisa dibaca, tanpa
+    scan ulang seluruh folder. Setelah itu diff (hanya file tersebut dan
+    record dengan Project No yang sama) terhadap snapshot scan dikirim agar
+    UI hanya memperbarui baris yang berubah. Ditunda selama scan berjalan.
+    """
+    files_retried = Signal(list, object) # path, SnapshotDiff
+
+    def __init__(self, store, scheduler, rates_path=None, timeout=60, mem_limit_mb=1024, parse_lock=None):
+        super().__init__()
+        self.store = store
+        self.parse_lock = parse_lock or threading.Lock() # Dibagi dengan PreviewWorker
+        self.scheduler = scheduler
+        self.rates_path = rates_path
+        self.timeout = timeout
+        self.mem_limit_mb = mem_limit_mb
+        self._wake = threading.Event()
+
+    def wake(self, paths=()):
+        """Panggil setelah scan menjadwalkan file, atau saat watcher melihat file terjadwal berubah."""
+        if paths: self.scheduler.expedite(paths)
+        self._wake.set()
+
+    def run(self):
+        parser = None
+        try:
+            while not self.isInterruptionRequested():
+                # Antrian kosong -> blok sampai ada jadwal baru (atau stop)
+                self._wake.wait(self.scheduler.next_delay())
+                self._wake.clear()
+                if self.isInterruptionRequested(): break
+                
+                # Scan berjalan -> tunggu; file yang berhasil di-parse scan sudah dilepas dari jadwal
+                if not acquire_lock(self.parse_lock, self.isInterruptionRequested): break
+                try:
+                    ready = self.scheduler.pop_due()
+                    if not ready: continue
+                    if parser is None:
+                        parser = IsolatedParser(timeout=self.timeout, mem_limit_mb=self.mem_limit_mb)
+                    retried = retry_files(ready, self.store, parser, self.rates_path, retry=self.scheduler)
+                    self.store.mark_duplicates(retried)
+                    
+                    keys = [os.path.basename(p) for p in ready]
+                    diff = StoredSnapshot(self.store).diff(StoredSnapshot(self.store, SCAN_SNAPSHOT), keys)
+                    self.store.save_snapshot(SCAN_SNAPSHOT, keys)
+                finally:
+                    self.parse_lock.release()
+                self.files_retried.emit(ready, diff)
+        finally:
+            if parser is not None: parser.close()
+
+    def stop(self):
+        self.requestInterruption()
+        self._wake.set()
 
 class GeneratorWorker(QThread):
     log_msg = Signal(str)
     finished = Signal(str)
     
-    def __init__(self, data_list, output_folder):
+    def __init__(self, data_list, output_folder, export_formats=(), write_xlsx=True, use_formulas=True,
+                 partition_by=None, partition_layout="sheets", write_changes=False):
         super().__init__()
-        self.data_list = data_list
+        self.write_changes = write_changes # Tambah sheet PERUBAHAN sejak generate terakhir
+        self.use_formulas = use_formulas # False -> kolom hitungan ditulis sebagai nilai (tanpa rumus)
+        self.partition_by = partition_by # None = satu sheet, "year" = per tahun proyek, atau nama field
+        self.partition_layout = partition_layout # "sheets" (1 workbook) atau "workbooks" (1 file per partisi)
+        self.data_list = data_list # RecordSource, sebaiknya salinan beku (RecordSource.freeze())
         self.output_folder = output_folder
+        self.export_formats = tuple(export_formats) # Mis. ("csv", "jsonl", "parquet")
+        self.write_xlsx = write_xlsx
         
     def run(self):
+        try:
+            self.generate()
+        finally:
+            # data_list dari RecordSource.freeze(): salinan sementara dihapus setelah generate
+            db = getattr(self.data_list, "db", None)
+            if db is not None and db.frozen: db.close()
+
+    def generate(self):
         self.log_msg.emit("🚀 Memulai proses generate...")
         
         # --- PERUBAHAN: Memproses SEMUA data, tidak hanya yang OK ---
@@ -151,192 +294,50 @@ class GeneratorWorker(QThread):
                 self.log_msg.emit(f"❌ Gagal copy {item['filename']}: {e}")
 
         self.log_msg.emit(f"✅ Berhasil menyalin {copied_count} file valid.")
+        current_year = datetime.now().year
 
-        # 2. GENERATE SUMMARY EXCEL
-        try:
-            current_year = datetime.now().year
+        # 2. EKSPOR DATA (CSV/JSONL/PARQUET) UNTUK ANALITIK
+        exported_paths = []
+        if self.export_formats:
+            try:
+                self.log_msg.emit("📦 Mengekspor data...")
+                exported_paths = export_records(processing_data, self.output_folder, 
+                                                f"PCM {current_year} DATA", self.export_formats)
+                self.log_msg.emit(f"✅ Ekspor data: {len(exported_paths)} file.")
+            except Exception as e:
+                self.finished.emit(f"ERROR: Ekspor data gagal: {e}")
+                return
+        
+        if not self.write_xlsx:
+            self.finished.emit("\n".join(exported_paths))
+            return
 
+        # 3. GENERATE SUMMARY EXCEL
+        try:
             self.log_msg.emit("📊 Membuat file summary...")
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = f"PCM {current_year} SUMMARY"
-            
-            # --- A. SETUP JUDUL (Row 1) ---
-            ws['B1'] = f"PCM {current_year} SUMMARY" 
-            ws['B1'].font = openpyxl.styles.Font(size=14, bold=True, name='Calibri')
-            
-            # --- B. SETUP HEADER (Row 3) ---
-            headers = [
-                "File name",      # Col 1 (A)
-                "No",             # Col 2 (B)
-                "Project no.",    # Col 3 (C)
-                "Busunit",        # Col 4 (D)
-                "Proj date",      # Col 5 (E)
-                "Cust name",      # Col 6 (F)
-                "Ccy",            # Col 7 (G)
-                "Project value",  # Col 8 (H)
-                "Kurs",           # Col 9 (I)
-                "Proj IDR",       # Col 10 (J)
-                "BARANG&JASA",    # Col 11 (K)
-                "Penalty",        # Col 12 (L)
-                "Warranty",       # Col 13 (M)
-                "Freight",        # Col 14 (N)
-                "Cost (estd.)",   # Col 15 (O)
-                "CM booked",      # Col 16 (P)
-                "CR booked",      # Col 17 (Q)
-                "CM IDR",         # Col 18 (R)
-                "CM %",           # Col 19 (S)
-                "COST %",         # Col 20 (T)
-                "Ket."            # Col 21 (U)
-            ]
-            
-            header_font = openpyxl.styles.Font(bold=True, name='Calibri', size=11)
-            header_fill = openpyxl.styles.PatternFill("solid", fgColor="00FFFF") 
-            
-            black_side = openpyxl.styles.Side(style='thin', color="000000")
-            border_black = openpyxl.styles.Border(left=black_side, right=black_side, top=black_side, bottom=black_side)
-            border_black_row = openpyxl.styles.Border(left=black_side, right=black_side)
-            
-            duplicate_fill = openpyxl.styles.PatternFill("solid", fgColor="FFFF00") # Kuning
-            error_fill = openpyxl.styles.PatternFill("solid", fgColor="FFCCCC") # Merah Muda (Untuk Error)
-            
-            header_row_idx = 3
-            ws.append([]) # Row 2 Kosong
-            ws.append(headers) # Row 3 Header
-            
-            for col_num, cell in enumerate(ws[header_row_idx], 1):
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.border = border_black
-                cell.alignment = openpyxl.styles.Alignment(horizontal='center', vertical='center')
-
-            # --- C. ISI DATA (Mulai Row 4) ---
-            start_data_row = header_row_idx + 1 
-            end_data_row = start_data_row + len(processing_data) - 1
-
-            for idx, item in enumerate(processing_data, 1):
-                r = header_row_idx + idx # Row index di Excel
-                
-                # --- PENGAMBILAN DATA (SAFE ACCESS) ---
-                # Menggunakan .get() karena file ERROR tidak punya key lengkap
-                val_project = item.get("Project Value", 0)
-                val_ccy = item.get("Currency", "IDR")
-                
-                raw_kurs = item.get("Kurs", 1.0)
-                val_kurs = 1.0 if val_ccy == "IDR" else (raw_kurs if raw_kurs else 1.0)
-                
-                val_cm = item.get("CM Booked", 0)
-                
-                # --- FIX DATE ---
-                val_date = item.get("_sort_date", datetime.min)
-                if val_date == datetime.min:
-                    val_date = item.get("Proj Date", "")
-
-                # --- RUMUS EXCEL ---
-                f_proj_idr = f"=H{r}*I{r}" 
-                val_cost = f"=SUM(K{r}:N{r})" 
-                
-                f_cr_booked = item.get("CR Booked", 0)
-                
-                f_cm_idr = f"=J{r}-O{r}" 
-                f_cm_pct = f"=IF(J{r}=0, 0, R{r}/J{r})"
-                f_cost_pct = f"=IF(J{r}=0, 0, O{r}/J{r})"
-                
-                # --- STATUS & KETERANGAN ---
-                status = item.get("status", "UNKNOWN")
-                status_ket = ""
-                
-                fill_color = None
-                
-                if status == "DUPLIKAT":
-                    status_ket = "Duplikat Input"
-                    fill_color = duplicate_fill
-                elif status != "OK":
-                    # Tampilkan pesan error di kolom Ket
-                    status_ket = item.get("msg", status)
-                    fill_color = error_fill
-
-                # Mapping Data
-                row_data = [
-                    item.get("filename", "Unknown"), # 1. Nama File
-                    idx,                             # 2. No
-                    item.get("Project No", "-"),     # 3. Project No
-                    "",                              # 4. Busunit
-                    val_date,                        # 5. Proj Date
-                    item.get("Cust Name", "-"),      # 6. Cust Name
-                    val_ccy,                         # 7. Ccy
-                    val_project,                     # 8. Project Value
-                    val_kurs,                        # 9. Kurs
-                    f_proj_idr,                      # 10. Proj IDR
-                    item.get("Sub Total", 0),        # 11. B&J
-                    item.get("Penalty", 0),          # 12. Penalty
-                    item.get("Warranty", 0),         # 13. Warranty
-                    0,                               # 14. Freight
-                    val_cost,                        # 15. Cost Estd
-                    val_cm,                          # 16. CM Booked
-                    f_cr_booked,                     # 17. CR Booked
-                    f_cm_idr,                        # 18. CM IDR
-                    f_cm_pct,                        # 19. CM %
-                    f_cost_pct,                      # 20. Cost %
-                    status_ket                       # 21. Ket (Isi Pesan Error)
-                ]
-                
-                ws.append(row_data)
-                
-                # Styling Baris
-                for c, val in enumerate(row_data, 1):
-                    cell = ws.cell(row=r, column=c)
-                    cell.border = border_black_row 
-                    
-                    if c == 5: cell.number_format = 'd-mmm-yy'
-                    if c in [8, 10, 11, 12, 13, 14, 15, 16, 18]: cell.number_format = '#,##0'
-                    if c == 9: cell.number_format = '#,##0.00'
-                    if c in [17, 19, 20]: cell.number_format = '0.00%'
-                    
-                    # Terapkan Warna (Kuning utk Duplikat, Merah utk Error)
-                    if fill_color:
-                        cell.fill = fill_color
-
-            # --- D. TAMBAHKAN BARIS TOTAL (SUMMARY) ---
-            if processing_data:
-                r_total = end_data_row + 1
-                
-                total_font = openpyxl.styles.Font(bold=True, name='Calibri', size=11)
-                total_border = openpyxl.styles.Border(top=black_side, bottom=openpyxl.styles.Side(style='medium', color="000000"))
-                
-                ws.cell(row=r_total, column=7, value="GRAND TOTAL").font = total_font
-                
-                sum_cols = [8, 10, 11, 12, 13, 14, 15, 16, 18]
-                
-                for c in range(1, len(headers) + 1):
-                    cell = ws.cell(row=r_total, column=c)
-                    
-                    if c in sum_cols:
-                        col_letter = openpyxl.utils.get_column_letter(c)
-                        sum_formula = f"=SUM({col_letter}{start_data_row}:{col_letter}{end_data_row})"
-                        cell.value = sum_formula
-                        cell.number_format = '#,##0'
-                    
-                    if c != 7 and c not in sum_cols:
-                         cell.border = openpyxl.styles.Border(top=black_side, bottom=openpyxl.styles.Side(style='medium', color="000000"))
-                    else:
-                         cell.border = total_border
-                    
-                    cell.font = total_font
-
-            # --- E. FINALISASI ---
-            dims = {}
-            for row in ws.rows:
-                for cell in row:
-                    if cell.value:
-                        dims[cell.column_letter] = max((dims.get(cell.column_letter, 0), len(str(cell.value))))    
-            for col, value in dims.items():
-                ws.column_dimensions[col].width = value + 2
-
-            summary_name = f"PCM {current_year} SUMMARY.xlsx"
-            summary_path = os.path.join(self.output_folder, summary_name)
+            # Data saat ini (RecordDB beku) dibandingkan dengan snapshot generate terakhir di folder output
+            db = processing_data.db
+            snapshot = StoredSnapshot(db)
+            changes = None
+            if self.write_changes:
+                previous = load_generate_snapshot(self.output_folder, db)
+                diff = snapshot.diff(previous)
+                if previous is not None: self.log_msg.emit(f"📝 Perubahan sejak generate terakhir: {diff.summary()}")
+                changes = (previous.taken_at, list(change_rows(diff, snapshot, previous))) if previous else (None, [])
             
-            wb.save(summary_path)
+            if self.partition_by:
+                if self.partition_layout == "workbooks":
+                    summary_path = write_partitioned_workbooks(self.output_folder, processing_data, self.partition_by,
+                                                               self.use_formulas, log=self.log_msg.emit, changes=changes)
+                else:
+                    summary_path = write_partitioned_sheets(self.output_folder, processing_data, self.partition_by,
+                                                            self.use_formulas, changes=changes)
+            else:
+                summary_name = f"PCM {current_year} SUMMARY.xlsx"
+                summary_path = os.path.join(self.output_folder, summary_name)
+                build_summary_workbook(summary_path, f"PCM {current_year} SUMMARY", processing_data,
+                                       self.use_formulas, changes=changes)
+            save_generate_snapshot(self.output_folder, db)
             self.finished.emit(summary_path)
 
         except Exception as e: